@@ -0,0 +1,83 @@
+import asyncio
+import importlib
+import random
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+import bot as bot_package
+from bot.bot import MusicBot
+from bot.logs import setup_logging
+
+
+class QuietBot(MusicBot):
+    def configure_logging(self):
+        return setup_logging(dict(self.config["logging"], path=None, console=None))
+
+
+def benchmark(messages=200_000, command_share=0.03, seed=1):
+    # The real command set, taken from the cog classes without starting them.
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    bot = QuietBot()
+    bot._connection.user = discord.ClientUser(state=bot._connection, data={
+        "id": "900000000000000001", "username": "bot", "discriminator": "0001", "avatar": None, "bot": True,
+    })
+    for path in sorted((Path(bot_package.__file__).parent / "cogs").glob("*.py")):
+        module = importlib.import_module(f"bot.cogs.{path.stem}")
+        for cog in vars(module).values():
+            if isinstance(cog, type) and issubclass(cog, commands.Cog) and cog.__module__ == module.__name__:
+                for command in cog.__cog_commands__:
+                    if command.name not in bot.all_commands:
+                        bot.add_command(command)
+
+    # Mostly chat, some of it starting with the prefix or a mention, and a few commands.
+    rng = random.Random(seed)
+    mention = f"<@{bot.user.id}>"
+    chat = ["lol", "anyone up for a game?", "brb", "...", ".. what", ".hmm", "ok so basically", "gg wp",
+            f"{mention} you there?", "https://example.com/watch?v=abc", "that track slaps", ":)"]
+    invocations = [".play never gonna give you up", ".q", ".skip", ".np", ".vol 50", ".pause", ".resume",
+                   f"{mention} np", ".shuffle", ".lyrics"]
+    author = SimpleNamespace(id=1, bot=False)
+    state = bot._connection
+    replay = [
+        SimpleNamespace(content=rng.choice(invocations if rng.random() < command_share else chat), author=author,
+                        _state=state)
+        for _ in range(messages)
+    ]
+
+    async def original(msg):
+        # Before the pre-filter: the mention prefix was rebuilt and a Context built for every message.
+        ctx = await bot.get_context(msg)
+        return ctx.command is not None
+
+    async def filtered(msg):
+        if not bot.is_command(msg.content):
+            return False
+        ctx = await bot.get_context(msg)
+        return ctx.command is not None
+
+    async def run(check):
+        start = time.perf_counter()
+        found = 0
+        for msg in replay:
+            found += await check(msg)
+        return found, time.perf_counter() - start
+
+    loop = asyncio.get_event_loop()
+    bot.command_prefix = lambda bot, msg: commands.when_mentioned_or(".")(bot, msg)
+    found, elapsed = loop.run_until_complete(run(original))
+    print(f"{'original':>9}: {messages / elapsed:10,.0f} messages/s ({found:,} commands)")
+
+    bot.command_prefix = bot.prefix
+    found, elapsed = loop.run_until_complete(run(filtered))
+    print(f"{'filtered':>9}: {messages / elapsed:10,.0f} messages/s ({found:,} commands)")
+
+    bot.log_handler.close()
+    loop.close()
+
+
+if __name__ == "__main__":
+    benchmark()
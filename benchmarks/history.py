@@ -0,0 +1,39 @@
+import random
+import sqlite3
+import time
+from types import SimpleNamespace
+
+from bot.history import SCHEMA, HistoryStore
+
+
+def benchmark(rows=100_000, guilds=50, path=":memory:"):
+    store = HistoryStore(path)
+    store._db = sqlite3.connect(path)
+    store._db.executescript(SCHEMA)
+
+    tracks = [SimpleNamespace(identifier=f"id{i}", title=f"Track {i}", author=f"Artist {i % 97}",
+                              uri=f"https://example.com/{i}") for i in range(5000)]
+    starts = [(random.randrange(guilds), track.identifier, track.title, track.author, track.uri, 1, float(n))
+              for n, track in enumerate(random.choice(tracks) for _ in range(rows))]
+    ends = [(180_000, g, i, s) for g, i, _, _, _, _, s in starts]
+
+    began = time.perf_counter()
+    for n in range(0, rows, 1000):
+        store._write(starts[n:n + 1000], ends[n:n + 1000])
+    elapsed = time.perf_counter() - began
+
+    began = time.perf_counter()
+    for guild_id in range(guilds):
+        store._query("SELECT title, plays FROM track_stats WHERE guild_id = ? ORDER BY plays DESC LIMIT 10",
+                     (guild_id, ))
+        store._query("SELECT title, started_at FROM plays WHERE guild_id = ? ORDER BY started_at DESC LIMIT 10",
+                     (guild_id, ))
+    query_elapsed = time.perf_counter() - began
+
+    store._db.close()
+    store._executor.shutdown()
+    print(f"{2 * rows / elapsed:,.0f} writes/s, {query_elapsed / (2 * guilds) * 1000:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+import random
+import resource
+import time
+
+import discord
+
+from bot.bot import gateway_options
+
+
+def replay_events(mode, guilds, members, events, seed, results):
+    # Runs in a process of its own, so the RSS is this mode's alone. Only the cache and parsing work is measured:
+    # the client has no listeners.
+    rng = random.Random(seed)
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    client = discord.Client(**gateway_options(mode))
+    state = client._connection
+    intents = state._intents
+    joined = "2021-01-01T00:00:00+00:00"
+
+    def user(i):
+        return {"id": str(10 ** 17 + i), "username": f"user{i}", "discriminator": f"{i % 10000:04d}", "avatar": None}
+
+    def member(i):
+        return {"user": user(i), "roles": [], "joined_at": joined, "deaf": False, "mute": False}
+
+    state.user = discord.ClientUser(state=state, data=dict(user(-1), bot=True))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # What Discord sends on connect: every member and presence with the privileged intents, otherwise only the
+    # members sitting in voice.
+    layout = []
+    for g in range(guilds):
+        guild_id = 2 * 10 ** 17 + g * 100
+        text, voice = [guild_id + c for c in range(1, 6)], guild_id + 10
+        in_voice = rng.sample(range(members), members // 50)
+        state._add_guild_from_data({
+            "id": str(guild_id), "name": f"guild-{g}", "owner_id": user(0)["id"], "member_count": members,
+            "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0}],
+            "channels": [{"id": str(c), "type": 0, "name": f"text-{c}", "position": 0} for c in text]
+            + [{"id": str(voice), "type": 2, "name": "voice", "position": 1, "bitrate": 64000, "user_limit": 0}],
+            "members": [member(i) for i in (range(members) if intents.members else in_voice)],
+            "presences": [{"user": {"id": user(i)["id"]}, "status": "online", "activities": [], "client_status": {}}
+                          for i in range(0, members, 3)] if intents.presences else [],
+            "voice_states": [{"user_id": user(i)["id"], "channel_id": str(voice), "session_id": f"s{i}",
+                              "deaf": False, "mute": False, "self_deaf": False, "self_mute": False, "suppress": False}
+                             for i in in_voice],
+        })
+        layout.append((str(guild_id), [str(c) for c in text], str(voice)))
+    cached = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def message(guild_id, channel_id, i, n):
+        return {"id": str(3 * 10 ** 17 + n), "channel_id": channel_id, "guild_id": guild_id, "author": user(i),
+                "member": {"roles": [], "joined_at": joined, "deaf": False, "mute": False}, "content": "hello",
+                "timestamp": joined, "edited_timestamp": None, "tts": False, "mention_everyone": False,
+                "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0}
+
+    # The same activity for both modes; each mode gets only the events its intents subscribe to.
+    kinds = {
+        "PRESENCE_UPDATE": (0.55, intents.presences, lambda g, c, v, i, n: {
+            "user": {"id": user(i)["id"]}, "guild_id": g, "status": rng.choice(("online", "idle", "dnd", "offline")),
+            "activities": [], "client_status": {}}),
+        "TYPING_START": (0.15, intents.guild_typing, lambda g, c, v, i, n: {
+            "channel_id": c, "guild_id": g, "user_id": user(i)["id"], "timestamp": 1600000000, "member": member(i)}),
+        "MESSAGE_CREATE": (0.20, intents.guild_messages, lambda g, c, v, i, n: message(g, c, i, n)),
+        "GUILD_MEMBER_UPDATE": (0.03, intents.members, lambda g, c, v, i, n: dict(member(i), guild_id=g,
+                                                                                   nick=f"nick{n}")),
+        "VOICE_STATE_UPDATE": (0.04, intents.voice_states, lambda g, c, v, i, n: {
+            "guild_id": g, "channel_id": rng.choice((v, None)), "user_id": user(i)["id"], "session_id": f"s{i}",
+            "deaf": False, "mute": False, "self_deaf": False, "self_mute": False, "suppress": False,
+            "member": member(i)}),
+        "MESSAGE_REACTION_ADD": (0.03, intents.guild_reactions, lambda g, c, v, i, n: {
+            "user_id": user(i)["id"], "channel_id": c, "message_id": str(3 * 10 ** 17 + rng.randrange(n + 1)),
+            "guild_id": g, "emoji": {"id": None, "name": "👍"}, "member": member(i)}),
+    }
+    names = list(kinds)
+    weights = [kinds[k][0] for k in names]
+
+    stream = []
+    for n, kind in enumerate(rng.choices(names, weights, k=events)):
+        _, subscribed, payload = kinds[kind]
+        if subscribed:
+            guild_id, text, voice = rng.choice(layout)
+            stream.append((state.parsers[kind], payload(guild_id, rng.choice(text), voice, rng.randrange(members), n)))
+
+    start = time.perf_counter()
+    for parse, data in stream:
+        parse(data)
+    elapsed = time.perf_counter() - start
+
+    results.put({"mode": mode, "delivered": len(stream), "elapsed": elapsed, "baseline_kb": baseline,
+                 "cached_kb": cached, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 "members": sum(len(g.members) for g in client.guilds)})
+
+
+def benchmark(guilds=100, members=1000, events=200_000, seed=1):
+    # The same synthetic activity replayed against the cache of each gateway mode, each in a fresh process.
+    spawn = multiprocessing.get_context("spawn")
+    for mode in ("all", "minimal"):
+        results = spawn.Queue()
+        process = spawn.Process(target=replay_events, args=(mode, guilds, members, events, seed, results))
+        process.start()
+        r = results.get()
+        process.join()
+
+        print(f"{mode:>7}: {r['delivered']:,} of {events:,} events delivered, {r['delivered'] / r['elapsed']:,.0f} "
+              f"events/s, all activity handled in {r['elapsed']:.2f}s; {r['members']:,} members cached, "
+              f"RSS {(r['cached_kb'] - r['baseline_kb']) / 1024:+.0f} MiB for the guild cache, "
+              f"max {r['rss_kb'] / 1024:.0f} MiB with the replay")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,60 @@
+import statistics
+import tempfile
+import time
+
+from bot.journal import StateJournal, empty_state
+
+
+def benchmark(guilds=1000, tracks=200, commands=100):
+    # Every guild journals a snapshot of a `tracks` long queue, then `commands` flushes of typical mutations, as
+    # a crash would leave them; recovery is the replay of all journals. The full restart against a fake gateway
+    # and Lavalink node is `python -m bot.loadtest --recover`.
+    def row(g, i):
+        # A Lavalink track id is about 150 characters of base64.
+        return [f"QAAAjQIA{'A' * 140}{g:06d}{i:05d}", f"Track {i}", f"Artist {i % 50}", 212000, f"{g:06d}{i:05d}",
+                f"https://www.youtube.com/watch?v={g:06d}{i:05d}", False, 10 ** 17 + g, time.time()]
+
+    def mutations(g, n):
+        if n % 4 == 0:
+            return [{"op": "add", "tracks": [row(g, tracks + n)]}]
+        if n % 4 == 1:
+            return [{"op": "play", "position": n % tracks, "ms": 0}]
+        if n % 4 == 2:
+            return [{"op": "ms", "value": n * 1000}]
+        return [{"op": "volume", "value": 50 + n % 50}]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = StateJournal(tmp)
+        journal.path.mkdir(parents=True, exist_ok=True)
+
+        start = time.perf_counter()
+        journal._write({
+            g: [{"op": "snapshot", "state": dict(empty_state(), tracks=[row(g, i) for i in range(tracks)], channel=g)}]
+            for g in range(guilds)
+        })
+        snapshots = time.perf_counter() - start
+
+        costs = []
+        for n in range(commands):
+            batch = {g: mutations(g, n) for g in range(guilds)}
+            start = time.perf_counter()
+            journal._write(batch)
+            costs.append(time.perf_counter() - start)
+
+        size = sum(p.stat().st_size for p in journal.path.glob("*.jsonl"))
+        start = time.perf_counter()
+        states = journal.load_all()
+        recovery = time.perf_counter() - start
+        journal._executor.shutdown()
+
+    costs.sort()
+    print(f"{guilds:,} guilds x {tracks} tracks: snapshots written in {snapshots:.2f}s, "
+          f"{size / 2 ** 20:.1f} MiB on disk")
+    print(f"  flush of one record per guild: {statistics.mean(costs) * 1000:.1f} ms mean, "
+          f"p99 {costs[int(len(costs) * 0.99)] * 1000:.1f} ms, {journal.compactions:,} compactions")
+    print(f"  recovery: {len(states):,} players replayed in {recovery:.2f}s "
+          f"({recovery / len(states) * 1000:.2f} ms per guild)")
+
+
+if __name__ == "__main__":
+    benchmark()
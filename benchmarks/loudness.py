@@ -0,0 +1,37 @@
+import sys
+import time
+
+from bot.loudness import READ_SIZE, SAMPLE_RATE, LoudnessAnalyzer, LoudnessMeter, load_numpy
+
+
+def benchmark(tracks=50, seconds=180.0):
+    rng = load_numpy().random.default_rng(0)
+    sources = [
+        (rng.standard_normal(int(SAMPLE_RATE * seconds)) * 10 ** (db / 20) * 32767 / 4).clip(-32768, 32767)
+        .astype("<i2").tobytes()
+        for db in (-30, -18, -6)
+    ]
+    started = time.perf_counter()
+
+    for n in range(tracks):
+        meter = LoudnessMeter()
+        pcm = sources[n % len(sources)]
+        for i in range(0, len(pcm), READ_SIZE):
+            meter.feed(pcm[i:i + READ_SIZE])
+        meter.integrated()
+
+    elapsed = time.perf_counter() - started
+    analyzer = LoudnessAnalyzer(workers=1)
+    for n in range(analyzer.cache_size):
+        analyzer.store(f"{n:011d}", analyzer.gain_for(rng.uniform(-30, -5)))
+    cache_bytes = sys.getsizeof(analyzer._gains) + sum(
+        sys.getsizeof(k) + sys.getsizeof(v) for k, v in analyzer._gains.items()
+    )
+    analyzer.stop()
+
+    print(f"{tracks * seconds / elapsed:,.0f}x realtime ({elapsed / tracks * 1000:.1f} ms per {seconds:.0f}s track), "
+          f"cache {len(analyzer)} entries ~{cache_bytes / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    benchmark()
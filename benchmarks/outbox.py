@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+import statistics
+import time
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+from bot.outbox import Outbox
+
+
+def benchmark(guilds=50, commands=20, interval=0.1, scale=0.1):
+    # A stand-in for Discord's REST API with its limits (5 messages per 5 s per channel, 50 requests per second)
+    # on a clock sped up by 1/scale. Requests over either are answered 429 and, as discord.py does, retried
+    # after the advised delay. Reported times are in unscaled seconds.
+    class RateLimitedHTTP:
+        def __init__(self):
+            self.requests = 0
+            self.limited = 0
+            self._channels = defaultdict(deque)
+            self._global = deque()
+
+        @staticmethod
+        def retry_after(window, limit, per, now):
+            while window and now - window[0] >= per:
+                window.popleft()
+            return per - (now - window[0]) if len(window) >= limit else 0.0
+
+        async def request(self, channel_id):
+            while True:
+                await asyncio.sleep(0.05 * scale)
+                now = time.monotonic()
+                self.requests += 1
+                window = self._channels[channel_id]
+                retry = max(self.retry_after(window, 5, 5.0 * scale, now),
+                            self.retry_after(self._global, 50, 1.0 * scale, now))
+                if not retry:
+                    window.append(now)
+                    self._global.append(now)
+                    return
+
+                self.limited += 1
+                await asyncio.sleep(retry)
+
+    class Message:
+        def __init__(self, id_, channel):
+            self.id = id_
+            self.channel = channel
+
+        async def edit(self, content=None):
+            await self.channel.http.request(self.channel.id)
+
+    class Channel:
+        def __init__(self, id_, http):
+            self.id = id_
+            self.http = http
+            self.ids = itertools.count()
+
+        async def send(self, content=None, **kwargs):
+            await self.http.request(self.id)
+            return Message(next(self.ids), self)
+
+    # Every guild's user spams a status command (volume, skip, ...) every `interval` seconds and hits one error
+    # halfway through; each command is its own task, as in discord.py.
+    async def run(reply):
+        http = RateLimitedHTTP()
+        errors = []
+        pending = []
+        start = time.monotonic()
+
+        async def timed(future, issued, latencies):
+            await future
+            latencies.append(time.monotonic() - issued)
+
+        for n in range(commands):
+            for g in range(guilds):
+                ctx = SimpleNamespace(guild=SimpleNamespace(id=g), channel=channels.setdefault(g, Channel(g, http)))
+                issued = time.monotonic()
+                if n == commands // 2:
+                    pending.append(asyncio.ensure_future(timed(await reply(ctx, "error", "Nothing to undo."),
+                                                               issued, errors)))
+                else:
+                    pending.append(asyncio.ensure_future(await reply(ctx, "status", f"Volume set to {n}%")))
+            await asyncio.sleep(interval * scale)
+
+        await asyncio.gather(*pending)
+        return http, (time.monotonic() - start) / scale, [e / scale for e in errors]
+
+    async def direct(ctx, kind, content):
+        return asyncio.ensure_future(ctx.channel.send(content))
+
+    def report(name, http, elapsed, errors):
+        errors.sort()
+        print(f"{name:>7}: {http.requests:,} requests, {http.limited:,} answered 429, last reply after {elapsed:.1f}s, "
+              f"error replies p50 {statistics.median(errors):.2f}s p99 {errors[int(len(errors) * 0.99)]:.2f}s")
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    channels = {}
+    report("direct", *loop.run_until_complete(run(direct)))
+
+    channels = {}
+    outbox = Outbox(SimpleNamespace(loop=loop, add_listener=lambda *args: None), 5, 5.0 * scale, 50, 1.0 * scale)
+
+    async def queued(ctx, kind, content):
+        return await (outbox.error(ctx, content) if kind == "error" else outbox.status(ctx, content))
+
+    report("outbox", *loop.run_until_complete(run(queued)))
+    print(f"  {outbox.sent:,} sent, {outbox.edited:,} edited in place, {outbox.coalesced:,} coalesced while queued")
+    loop.close()
+
+
+if __name__ == "__main__":
+    benchmark()
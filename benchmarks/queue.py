@@ -0,0 +1,49 @@
+import time
+
+from bot.cogs.music import QUEUE_PAGE_SIZE, Queue
+from bot.tracks import TrackStub
+
+
+def benchmark(sizes=(1_000, 10_000, 100_000), rounds=2000):
+    # Per-operation cost of the queue as it grows. Appending, reading a page and advancing stay flat; edits in the
+    # middle pay a memmove of the tail (microseconds at 100k), and shuffles are linear.
+    def stub(i):
+        return TrackStub(f"id{i}", f"Track {i}", "Artist", 180_000, f"{i:011d}", f"https://youtu.be/{i:011d}")
+
+    def timed(op, n=rounds):
+        start = time.perf_counter()
+        for i in range(n):
+            op(i)
+        return (time.perf_counter() - start) / n
+
+    print(f"{'tracks':>8} {'add':>8} {'page':>8} {'advance':>8} {'insert':>8} {'remove':>8} {'move':>8} "
+          f"{'move+undo':>9} {'add 100':>8} {'shuffle':>9}")
+    for size in sizes:
+        queue = Queue()
+        queue.add(*(stub(i) for i in range(size)))
+        batch = [stub(i) for i in range(100)]
+        extra = stub(-1)
+
+        def move_and_undo(i):
+            queue.move(0, size // 2)
+            queue.undo()
+
+        costs = [
+            timed(lambda i: queue.add(extra)),
+            timed(lambda i: (len(queue.upcoming), queue.window((i * QUEUE_PAGE_SIZE) % size, QUEUE_PAGE_SIZE))),
+            timed(lambda i: queue.get_next_track()),
+            timed(lambda i: queue.insert(size // 2, extra)),
+            timed(lambda i: queue.remove(size // 2)),
+            timed(lambda i: queue.move(0, size // 2)),
+            timed(move_and_undo),
+            timed(lambda i: queue.add(*batch), rounds // 10),
+        ]
+        shuffle = timed(lambda i: queue.shuffle(), 5)
+
+        widths = (8, 8, 8, 8, 8, 8, 9, 8)
+        print(f"{size:>8,} " + " ".join(f"{c * 1e6:{w - 2}.2f}us" for w, c in zip(widths, costs))
+              + f" {shuffle * 1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    benchmark()
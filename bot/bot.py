@@ -1,79 +1,250 @@
+import logging
+import time
 from itertools import cycle
 from pathlib import Path
 
 import discord
 from discord.ext import commands, tasks
 
-class MusicBot(commands.Bot):
-
-    def __init__(self):
-        self._cogs = [p.stem for p in Path(".").glob("./bot/cogs/*.py")]
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .config import load_config
+from .dispatch import CommandTrie
+from .ipc import IPCClient
+from .logs import setup_logging
+from .menus import MenuManager
+from .metrics import LoopLagMonitor, Metrics, MetricsServer
+from .nodes import NodeUnavailable
+from .outbox import Outbox
+from .startup import StartupTimer
+
+log = logging.getLogger(__name__)
+
+
+def gateway_options(mode):
+    if mode == "all":
+        return {"intents": discord.Intents.all()}
+
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.voice_states = True
+    intents.messages = True
+    intents.reactions = True
+
+    member_cache_flags = discord.MemberCacheFlags.none()
+    member_cache_flags.voice = True
+
+    return {
+        "intents": intents,
+        "member_cache_flags": member_cache_flags,
+        "chunk_guilds_at_startup": False,
+        "max_messages": None,
+    }
+
+
+class MusicBot(commands.AutoShardedBot):
+
+    def __init__(self, shard_ids=None, shard_count=None, worker_id=None, ipc_port=None):
+        self.startup = StartupTimer()
+        with self.startup.phase("config"):
+            self.config = load_config()
+        self.worker_id = worker_id
+        self.log_handler = self.configure_logging()
+        self.ipc = IPCClient(worker_id, port=ipc_port) if ipc_port is not None else None
+        self.metrics = Metrics()
+        self.startup.metrics = self.metrics
+        self.loop_lag = LoopLagMonitor(self.metrics, self.config["metrics"]["loop_lag_interval"])
+        self.metrics_server = MetricsServer(self.metrics, self.config["metrics"]["host"],
+                                            self.config["metrics"]["port"] + (worker_id or 0))
+        self._cogs = []
         self.status = cycle(['made by Runnz', 'bot.py', '.help'])
-        print("cog loaded")
-        super().__init__(command_prefix=self.prefix, case_insensitive=True, intents=discord.Intents.all(),
-                         help_command=None)
+        self._prefixes = None
+        self._command_trie = None
+        super().__init__(command_prefix=self.prefix, case_insensitive=True, help_command=None,
+                         shard_ids=shard_ids, shard_count=shard_count,
+                         **gateway_options(self.config["gateway"]["intents"]))
+        self.menus = MenuManager(self)
+        self.outbox = Outbox(self, **self.config["outbox"])
+        self.metrics.gauge("discord_gateway_latency_seconds", lambda: self.latency)
+        self.metrics.gauge("discord_guilds", lambda: len(self.guilds))
+        self.metrics.gauge("menus_open", lambda: len(self.menus))
+        self.metrics.gauge("outbox_pending", lambda: len(self.outbox))
+        self.metrics.gauge("log_records_dropped", lambda: self.log_handler.dropped)
+        for stat in ("sent", "edited", "coalesced"):
+            self.metrics.gauge(f"outbox_{stat}", lambda stat=stat: getattr(self.outbox, stat))
+
+    def configure_logging(self):
+        return setup_logging(self.config["logging"], self.file_suffix)
 
     def setup(self):
         self._cogs = [p.stem for p in Path(".").glob("./bot/cogs/*.py")]
-        print("Running setup ...")
+        log.info("Running setup")
+
+        with self.startup.phase("extensions"):
+            for cog in self._cogs:
+                self.load_extension(f'bot.cogs.{cog}')
+                log.info("Loaded %s cog", cog, extra={"cog": cog})
 
-        for cog in self._cogs:
-            self.load_extension(f'bot.cogs.{cog}')
-            print(f"Loaded `{cog}` cog.")
+        self.loop_lag.start(self.loop)
+        if self.config["metrics"]["enabled"]:
+            self.loop.create_task(self.metrics_server.start())
+        if self.ipc is not None:
+            self.loop.create_task(self.start_ipc())
 
-        print("Setup complete!")
+        log.info("Setup complete")
 
     def run(self):
+        if not self.config["token"]:
+            raise RuntimeError("No bot token configured; set \"token\" in data/config.json.")
+
         self.setup()
-        with open("data/token", "r", encoding="utf-8") as f:
-            TOKEN = f.read()
+        log.info("Running bot", extra={"worker": self.worker_id, "shards": self.shard_ids})
+        super().run(self.config["token"], reconnect=True)
+
+    def startup_complete(self):
+        if "first_playable" in self.startup.marks:
+            return
 
-        print("Running bot!")
-        super().run(TOKEN, reconnect=True)
+        first_playable = self.startup.mark("first_playable")
+        log.info(self.startup.report(), extra={"event": "startup", "latency_ms": round(first_playable * 1000)})
 
     async def shutdown(self):
-        print("Shutting down the connection to Discord...")
+        log.info("Shutting down the connection to Discord")
+        self.loop_lag.stop()
+        await self.metrics_server.stop()
+        if self.ipc is not None:
+            self.push_worker_stats.cancel()
+            await self.ipc.close()
         await super().close()
+        self.log_handler.close()
 
     async def close(self):
-        print("Closing on keyboard interrupt...")
+        log.info("Closing on keyboard interrupt")
         await self.shutdown()
 
+    @property
+    def file_suffix(self):
+        return "" if self.worker_id is None else f".{self.worker_id}"
+
+    def owns_guild(self, guild_id):
+        if self.shard_ids is None:
+            return True
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
+
+    def worker_stats(self):
+        music = self.get_cog("Music")
+        return {
+            "shards": list(self.shards.keys()),
+            "guilds": len(self.guilds),
+            "players": len(music.wavelink.players) if music is not None else 0,
+            "latency": self.latency,
+            "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None,
+        }
+
+    async def start_ipc(self):
+        await self.ipc.connect()
+        self.push_worker_stats.start()
+
+    @tasks.loop(seconds=10.0)
+    async def push_worker_stats(self):
+        await self.ipc.push_stats(self.worker_stats())
+
     async def on_connect(self):
-        print(f"Connect to discord (latency:{self.latency * 1000} ms)")
+        self.startup.mark("gateway_connected")
+        log.info("Connected to Discord", extra={"latency_ms": round(self.latency * 1000, 1)})
 
     async def on_resumed(self):
-        print("Bot resumed")
+        log.info("Resumed Discord session")
 
     async def on_disconnect(self):
-        print("Bot disconnected")
+        log.warning("Disconnected from Discord")
 
     async def on_error(self, err, *args, **kwargs):
         raise
 
     async def on_command_error(self, ctx, exc):
+        self.metrics.inc("command_errors_total", command=ctx.command.qualified_name if ctx.command else "unknown",
+                         error=type(getattr(exc, "original", exc)).__name__)
+        if isinstance(exc, NodeUnavailable):
+            await self.outbox.error(ctx, "No audio node is available right now, try again in a moment.")
+            return
         raise getattr(exc, "original", exc)
 
     @commands.Cog.listener()
     async def on_ready(self):
+        self.startup.mark("gateway_ready")
         self.client_id = (await self.application_info()).id
         await self.wait_until_ready()
         self.change_status.start()
-        print("Bot ready to go...")
+        log.info("Bot ready", extra={"guilds": len(self.guilds)})
 
     @tasks.loop(seconds=3.0)
     async def change_status(self):
         await self.change_presence(activity=discord.Game(next(self.status)))
 
+    def get_prefixes(self):
+        if self._prefixes is not None:
+            return self._prefixes
+
+        if self.user is None:
+            return ["."]
+
+        self._prefixes = [f"<@{self.user.id}> ", f"<@!{self.user.id}> ", "."]
+        return self._prefixes
+
     async def prefix(self, bot, msg):
-        return commands.when_mentioned_or(".")(bot, msg)
+        return self.get_prefixes()
+
+    @property
+    def command_trie(self):
+        if self._command_trie is None:
+            self._command_trie = CommandTrie.from_commands(self.commands)
+        return self._command_trie
+
+    def add_command(self, command):
+        super().add_command(command)
+        self._command_trie = None
+
+    def remove_command(self, name):
+        command = super().remove_command(name)
+        self._command_trie = None
+        return command
+
+    def is_command(self, content):
+        for prefix in self.get_prefixes():
+            if content.startswith(prefix):
+                return self.command_trie.match(content, len(prefix))
+        return False
+
+    async def invoke(self, ctx):
+        start = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            if ctx.command is not None:
+                latency = time.perf_counter() - start
+                self.metrics.observe("command_latency_seconds", latency, command=ctx.command.qualified_name)
+                log.info("Command %s finished", ctx.command.qualified_name, extra={
+                    "event": "command",
+                    "guild": ctx.guild.id if ctx.guild is not None else None,
+                    "channel": ctx.channel.id,
+                    "user": ctx.author.id,
+                    "command": ctx.command.qualified_name,
+                    "latency_ms": round(latency * 1000, 2),
+                    "failed": ctx.command_failed,
+                })
 
     async def process_commands(self, msg):
+        start = time.perf_counter()
         ctx = await self.get_context(msg, cls=commands.Context)
 
         if ctx.command is not None:
+            self.metrics.observe("command_context_seconds", time.perf_counter() - start)
             await self.invoke(ctx)
 
     async def on_message(self, msg):
-        if not msg.author.bot:
+        if not msg.author.bot and self.is_command(msg.content):
             await self.process_commands(msg)
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from .tracks import TrackResults
+
+
+class TrackCache:
+    # Bounded by the number of tracks held rather than entries, so a handful of huge playlists can't outgrow it.
+    def __init__(self, max_tracks=50000, ttl=3600.0, path=None):
+        self.max_tracks = max_tracks
+        self.ttl = ttl
+        self.path = Path(path) if path is not None else None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.tracks = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def normalize(query):
+        query = " ".join(query.split())
+        if query.lower().startswith("ytsearch:"):
+            return "ytsearch:" + query[9:].strip().lower()
+        return query
+
+    def get(self, key):
+        if (entry := self._entries.get(key)) is None:
+            return None
+
+        expires, results = entry
+        if expires < time.time():
+            self.discard(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return results
+
+    def put(self, key, results, expires=None):
+        if len(results) > self.max_tracks:
+            return
+
+        self.discard(key)
+        self._entries[key] = (expires or time.time() + self.ttl, results)
+        self.tracks += len(results)
+
+        while self.tracks > self.max_tracks:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.tracks -= len(evicted)
+
+    def discard(self, key):
+        if (entry := self._entries.pop(key, None)) is not None:
+            self.tracks -= len(entry[1])
+
+    def clear(self):
+        self._entries.clear()
+        self.tracks = 0
+
+    async def get_tracks(self, loader, query, refresh=False):
+        key = self.normalize(query)
+
+        # A refresh skips the cached result (a track that failed to play) but still joins a load in flight.
+        if refresh:
+            self.discard(key)
+        elif (results := self.get(key)) is not None:
+            self.hits += 1
+            return results
+
+        if (task := self._pending.get(key)) is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = self._pending[key] = asyncio.ensure_future(loader(key))
+        task.add_done_callback(lambda t: self._resolved(key, t))
+        return await asyncio.shield(task)
+
+    def _resolved(self, key, task):
+        self._pending.pop(key, None)
+
+        if not task.cancelled() and task.exception() is None and task.result():
+            self.put(key, task.result())
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "tracks": self.tracks,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+    def dump(self):
+        now = time.time()
+        return [
+            {"key": key, "expires": expires, "playlist": results.playlist, "loaded_at": results.loaded_at,
+             "rows": results.rows}
+            for key, (expires, results) in self._entries.items() if expires >= now
+        ]
+
+    def save(self, entries=None):
+        if self.path is None:
+            return
+
+        entries = self.dump() if entries is None else entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+
+        tmp.replace(self.path)
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return 0
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        now = time.time()
+        for entry in entries:
+            if entry["expires"] < now:
+                continue
+
+            results = TrackResults(tuple(map(tuple, entry["rows"])), entry["playlist"], entry["loaded_at"])
+            self.put(entry["key"], results, expires=entry["expires"])
+
+        return len(self._entries)
@@ -0,0 +1,59 @@
+from discord.ext import commands
+from discord.ext.commands import Cog
+from discord.ext.commands import command, is_owner
+
+# Music owns the wavelink client, its node connections and every live player; a reload would build a second client
+# next to the first and orphan the players, so it takes a restart.
+NOT_RELOADABLE = {"music"}
+
+
+class Admin(Cog):
+
+    def __init__(self, bot):
+        self.bot = bot
+        if bot.ipc is not None:
+            bot.ipc.handlers["reload"] = self.reload_local
+
+    def cog_unload(self):
+        if self.bot.ipc is not None:
+            self.bot.ipc.handlers.pop("reload", None)
+
+    async def reload_local(self, extension):
+        if extension in NOT_RELOADABLE:
+            return {"error": f"{extension} can't be reloaded, restart the worker instead"}
+
+        try:
+            self.bot.reload_extension(f"bot.cogs.{extension}")
+        except commands.ExtensionError as exc:
+            return {"error": str(exc)}
+        return {"reloaded": extension}
+
+    @command(name="shards")
+    @is_owner()
+    async def shards_command(self, ctx):
+        if self.bot.ipc is None:
+            workers = {"0": self.bot.worker_stats()}
+        else:
+            workers = await self.bot.ipc.request("stats")
+
+        lines = [
+            f"Worker {worker}: shards {stats['shards']}, {stats['guilds']:,} guilds, "
+            f"{stats['players']:,} players, {stats['latency'] * 1000:,.0f} ms"
+            for worker, stats in sorted(workers.items())
+        ]
+        await ctx.send("\n".join(lines) or "No workers reporting.")
+
+    @command(name="reload")
+    @is_owner()
+    async def reload_command(self, ctx, extension: str):
+        if self.bot.ipc is None:
+            results = {"0": await self.reload_local(extension)}
+        else:
+            results = await self.bot.ipc.request("reload", extension)
+
+        lines = [f"Worker {worker}: {result.get('error', 'reloaded')}" for worker, result in sorted(results.items())]
+        await ctx.send("\n".join(lines) or "No workers replied.")
+
+
+def setup(bot):
+    bot.add_cog(Admin(bot))
@@ -1,63 +1,82 @@
 import asyncio
 import datetime as dt
-import time
 
 import discord
 from discord.ext.commands import Cog
 from discord.ext.commands import command
 
 OPTIONS = {"❌": 0}
+CATEGORIES = [
+    ("Playback", [
+        ("`.join`", "Connect the bot to the current channel."),
+        ("`.leave` | `.lv`", "Disconnect the bot from the channel."),
+        ("`.play <url> | <track name>`", "Play the track that you choose"),
+        ("`.resume` | `.rs`", "Resumes the track if is in pause"),
+        ("`.pause` | `.p`", "Pauses the track if is playing"),
+        ("`.next` | `.skip`", "Skip to the next track"),
+        ("`.previous`", "Play the previous track"),
+        ("`.skipto <position> | <title or artist>`", "Skip to the track that you choose"),
+        ("`.repeat` | `.rpt` | `.rp`", "Repeat the track"),
+        ("`.autoplay [on|off]` | `.radio`", "Keeps playing related tracks when the queue runs out"),
+        ("`.playing` | `.np`", "Shows the playing track"),
+    ]),
+    ("Queue", [
+        ("`.queue [page]` | `.q [page]`", "Browse the tracks in queue"),
+        ("`.find <title or artist>` | `.search`", "Finds upcoming tracks and their positions"),
+        ("`.clearqueue` | `.clearq`", "Clears the queue"),
+        ("`.shuffle` | `.sh`", "Shuffles the upcoming tracks"),
+        ("`.remove <from> [to] | <title or artist>` | `.rm`", "Removes a track or a range of tracks"),
+        ("`.removeby [member]`", "Removes every track requested by a member"),
+        ("`.dedupe`", "Removes duplicate tracks from the queue"),
+        ("`.move <from> <to>` | `.mv`", "Moves a track to another position"),
+        ("`.undo`", "Undoes the last shuffle, remove, dedupe or move"),
+    ]),
+    ("Sound", [
+        ("`.volume < up or + > | < down or - > | < value >`", "Regulates the volume"),
+        ("`.eq <flat | boost | metal | piano | bassboost>`", "Applies an equalizer preset"),
+        ("`.bassboost` | `.bb`", "Toggles bass boost"),
+        ("`.timescale <normal | nightcore | vaporwave>`", "Changes the playback speed and pitch"),
+        ("`.nightcore` | `.vaporwave`", "Toggles the nightcore or vaporwave timescale"),
+        ("`.resetfilters`", "Clears every equalizer and timescale filter"),
+        ("`.normalize [on|off]` | `.norm`", "Evens out loudness between tracks"),
+    ]),
+    ("History", [
+        ("`.top [count]`", "Shows the most played tracks in this server"),
+        ("`.recent [count]` | `.history`", "Shows the recently played tracks"),
+    ]),
+]
+
+
+def build_help_embed():
+    # One field per category: Discord rejects embeds with more than 25 fields, or fields over 1024 characters.
+    embed = discord.Embed(title="justRunnz Help", description="Shows all commands bot")
+    for name, entries in CATEGORIES:
+        embed.add_field(name=name, value="\n".join(f"{usage} - {text}" for usage, text in entries), inline=False)
+    return embed
 
 
 class Help(Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.help_embed = build_help_embed()
 
     @command(name="help")
     async def show_help(self, ctx):
         await ctx.message.delete()
 
-        def _check(r, u):
-            return (
-                    r.emoji in OPTIONS.keys()
-                    and u == ctx.author
-                    and r.message.id == msg.id
-            )
-
-        embed = discord.Embed(title="justRunnz Help",
-                              description=f"Shows all commands bot",
-                              color=ctx.author.colour,
-                              timestamp=dt.datetime.utcnow()
-                              )
-        embed.add_field(name=f"`.join`", value="Connect the bot to the current channel.", inline=False)
-        embed.add_field(name=f".`leave` | `.lv`", value="Disconnect the bot from the channel.", inline=False)
-        embed.add_field(name=f"`.play <url> | <track name>`", value="Play the track that you choose", inline=False)
-        embed.add_field(name=f"`.resume` | `.rs`", value="Resumes the track if is in pause", inline=False)
-        embed.add_field(name=f"`.pause` | `.p`", value="Pauses the track if is playing", inline=False)
-        embed.add_field(name=f"`.next` | `.skip`", value="Skip to the next track", inline=False)
-        embed.add_field(name=f"`.previous`", value="Play the previous track", inline=False)
-        embed.add_field(name=f"`.repeat` | `.rpt` | `.rp`", value="Repeat the track", inline=False)
-        embed.add_field(name=f"`.queue` | `.q `", value="Shows tracks in queue", inline=False)
-        embed.add_field(name=f"`.clearqueue` | `.clearq`", value="Clears the queue", inline=False)
-        embed.add_field(name=f"`.playing` | .np`", value="Shows the playing track", inline=False)
-        embed.add_field(name=f"`.skipto <track>`", value="Skip to the track that you choose", inline=False)
-        embed.add_field(name=f"`.volume < up or + > | < down or - > | < value >`", value="Regulates the volume",
-                        inline=False)
-
+        embed = self.help_embed.copy()
+        embed.colour = ctx.author.colour
+        embed.timestamp = dt.datetime.utcnow()
         embed.set_footer(text=f"Requested by {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
 
         msg = await ctx.send(embed=embed)
 
         await msg.add_reaction("❌")
 
-        try:
-            reaction, _ = await self.bot.wait_for("reaction_add", check=_check)
-        except asyncio.TimeoutError:
-            await msg.delete()
-        else:
-            time.sleep(0.25)
-            await msg.delete()
+        if await self.bot.menus.wait(msg, ctx.author, OPTIONS, timeout=120.0) is not None:
+            await asyncio.sleep(0.25)
+        await msg.delete()
 
 
 def setup(bot):
@@ -1,13 +1,36 @@
 import asyncio
 import datetime as dt
+import logging
+import random
 import re
+import time
 import typing as t
+from collections import deque
 from enum import Enum
 
 import discord
 import wavelink
-from discord.ext import commands
-
+from discord.ext import commands, tasks
+
+from ..cache import TrackCache
+from ..filters import EQ_PRESETS, TIMESCALE_PRESETS, build_filters
+from ..history import HistoryStore
+from ..journal import StateJournal, empty_state
+from ..loudness import LoudnessAnalyzer
+from ..nodes import NodePool, node_penalty
+from ..radio import SEED_COUNT, Radio
+from ..reaper import IdleReaper
+from ..search import TrackIndex
+from ..tracks import TrackStub
+from ..views import QueueRenderer, format_duration, format_total
+
+log = logging.getLogger(__name__)
+
+INGEST_CHUNK_SIZE = 100
+PREFETCH_COUNT = 3
+# Older resolutions are refreshed before playing; longer than the track cache keeps results, so it's a real reload.
+TRACK_MAX_AGE = 3 * 3600.0
+FILTER_DEBOUNCE = 0.25
 URL_REGEX = r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))"
 OPTIONS = {
     "1️⃣": 0,
@@ -16,6 +39,10 @@ OPTIONS = {
     "4⃣": 3,
     "5⃣": 4,
 }
+QUEUE_PAGE_SIZE = 10
+QUEUE_CONTROLS = ("⏮", "◀", "▶", "⏭")
+INDEX_REGEX = re.compile(r"^(\d+)(?:\s+(\d+))?$")
+FIND_LIMIT = 10
 
 
 class AlreadyConnectedToChannel(commands.CommandError):
@@ -70,81 +97,368 @@ class MinVolume(commands.CommandError):
     pass
 
 
+class NothingToUndo(commands.CommandError):
+    pass
+
+
+class NoMatchingTracks(commands.CommandError):
+    pass
+
+
+class NoHistory(commands.CommandError):
+    pass
+
+
+class InvalidPreset(commands.CommandError):
+    pass
+
+
+class NormalizationUnavailable(commands.CommandError):
+    pass
+
+
 class RepeatMode(Enum):
     NONE = 0
     ONE = 1
     ALL = 2
 
 
+class QueueView:
+    def __init__(self, items, start, stop):
+        self._items = items
+        self._start = start
+        self._stop = max(start, stop)
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __bool__(self):
+        return self._stop > self._start
+
+    def __iter__(self):
+        items = self._items
+        for i in range(self._start, self._stop):
+            yield items[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self._items[self._start + start:self._start + stop]
+            return [self._items[self._start + i] for i in range(start, stop, step)]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("queue index out of range")
+
+        return self._items[self._start + index]
+
+
 class Queue:
-    def __init__(self):
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, max_history=100, undo_budget=50000):
         self._queue = []
-        self.position = 0
+        self._head = 0
+        self._position = 0
+        self._remaining_length = 0
+        self._version = 0
+        self._undo = deque()
+        self._undo_cost = 0
+        self.max_history = max_history
+        self.undo_budget = undo_budget
         self.repeat_mode = RepeatMode.NONE
+        self.listeners = []
+        # Track -> index in _queue, for locate. Appends extend it; edits that shift tracks drop it until the next
+        # lookup rebuilds it.
+        self._slots = {}
+        self._slots_valid = True
+
+    def _notify(self, event, *args):
+        self._version += 1
+        for listener in self.listeners:
+            listener(event, *args)
+
+    @staticmethod
+    def _track_length(track):
+        return 0 if track.is_stream else track.length
+
+    def _span(self, start, stop):
+        lo, hi = max(start + 1, self._head), min(stop, len(self._queue) - 1)
+        return sum(self._track_length(self._queue[i]) for i in range(lo, hi + 1))
+
+    @property
+    def position(self):
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        if value > self._position:
+            self._remaining_length -= self._span(self._position, value)
+        elif value < self._position:
+            self._remaining_length += self._span(value, self._position)
+        if value != self._position:
+            self._version += 1
+            self._moved(self._position, value)
+        self._position = value
+
+    def _moved(self, old, new):
+        # Tracks the position passes are no longer upcoming, and the ones it goes back over are again. Not a
+        # _notify: moving along the queue isn't an edit and mustn't invalidate undo.
+        lo, hi = min(old, new), max(old, new)
+        tracks = [t for t in self._queue[max(lo + 1, self._head):hi + 1] if t is not None]
+        for listener in self.listeners:
+            listener("advance" if new > old else "rewind", tracks)
+
+    @property
+    def remaining_length(self):
+        return self._remaining_length
 
     @property
     def is_empty(self):
-        return not self._queue
+        return self._head >= len(self._queue)
 
     @property
     def first_track(self):
-        if not self._queue:
+        if self.is_empty:
             raise QueueIsEmpty
 
-        return self._queue[0]
+        return self._queue[self._head]
 
     @property
     def current_track(self):
-        if not self._queue:
+        if self.is_empty:
             raise QueueIsEmpty
 
         return self._queue[self.position]
 
     @property
     def upcoming(self):
-        if not self._queue:
+        if self.is_empty:
             raise QueueIsEmpty
 
-        return self._queue[self.position + 1:]
+        return QueueView(self._queue, self.position + 1, len(self._queue))
 
     @property
     def length(self):
-        return len(self._queue)
+        return len(self._queue) - self._head
+
+    @property
+    def offset(self):
+        return self.position - self._head
+
+    @property
+    def tracks(self):
+        return QueueView(self._queue, self._head, len(self._queue))
 
     @property
     def history(self):
-        if not self._queue:
+        if self.is_empty:
             raise QueueIsEmpty
-        return self._queue[:self.position]
+
+        return QueueView(self._queue, self._head, self.position)
+
+    def window(self, start, count):
+        return self.upcoming[start:start + count]
 
     def add(self, *args):
+        start = len(self._queue)
         self._queue.extend(args)
+        if self._slots_valid:
+            self._slots.update((t, i) for i, t in enumerate(args, start))
+        self._remaining_length += sum(
+            self._track_length(t) for i, t in enumerate(args, start) if i > self._position
+        )
+        self._notify("add", args)
+
+    def insert(self, index, *tracks):
+        at = min(self.position + 1 + max(index, 0), len(self._queue))
+        self._queue[at:at] = tracks
+        self._invalidate_slots()
+        if at > self.position:
+            self._remaining_length += sum(self._track_length(t) for t in tracks)
+        self._notify("insert", at - self._head, tracks)
+
+    def remove(self, index):
+        if not 0 <= index < len(self._queue) - self.position - 1:
+            raise IndexError("queue index out of range")
+
+        track = self._queue.pop(self.position + 1 + index)
+        self._invalidate_slots()
+        self._remaining_length -= self._track_length(track)
+        self._notify("remove", self.position + 1 + index - self._head, 1, (track, ))
+        return track
+
+    def move(self, src, dst):
+        version = self._version
+        track = self.remove(src)
+        # Past the end means last; undo has to take the track back from where it actually landed.
+        dst = min(dst, len(self._queue) - self.position - 1)
+        self.insert(dst, track)
+        self._push_undo(version, "move", (dst, src), 1)
+        return track, dst
+
+    def remove_range(self, start, stop):
+        if self.is_empty:
+            raise QueueIsEmpty
+
+        at = self.position + 1 + max(start, 0)
+        removed = self._queue[at:self.position + 1 + stop]
+        if not removed:
+            raise IndexError("queue index out of range")
+
+        version = self._version
+        del self._queue[at:at + len(removed)]
+        self._invalidate_slots()
+        self._remaining_length -= sum(self._track_length(t) for t in removed)
+        self._notify("remove", at - self._head, len(removed), removed)
+        self._push_undo(version, "insert", (max(start, 0), removed), len(removed))
+        return removed
+
+    def remove_where(self, predicate):
+        return self._filter_upcoming(lambda t: not predicate(t))
+
+    def dedupe(self):
+        if self.is_empty:
+            raise QueueIsEmpty
+
+        seen = {t.identifier for t in self._queue[self._head:self.position + 1]}
+
+        def _keep(track):
+            if track.identifier in seen:
+                return False
+            seen.add(track.identifier)
+            return True
+
+        return self._filter_upcoming(_keep)
+
+    def _filter_upcoming(self, keep):
+        if self.is_empty:
+            raise QueueIsEmpty
+
+        upcoming = self._queue[self.position + 1:]
+        kept = [t for t in upcoming if keep(t)]
+        if len(kept) == len(upcoming):
+            return 0
+
+        version = self._version
+        self._set_upcoming(kept)
+        self._push_undo(version, "upcoming", upcoming, len(upcoming))
+        return len(upcoming) - len(kept)
+
+    def shuffle(self):
+        if self.is_empty:
+            raise QueueIsEmpty
+
+        upcoming = self._queue[self.position + 1:]
+        version = self._version
+        shuffled = upcoming[:]
+        random.shuffle(shuffled)
+        self._set_upcoming(shuffled)
+        self._push_undo(version, "upcoming", upcoming, len(upcoming))
+
+    def _set_upcoming(self, tracks):
+        previous = self._queue[self.position + 1:]
+        self._queue[self.position + 1:] = tracks
+        self._invalidate_slots()
+        self._remaining_length = sum(self._track_length(t) for t in tracks)
+
+        if len(previous) == len(tracks):
+            self._notify("reorder")
+        else:
+            kept, before = set(tracks), set(previous)
+            self._notify("reorder", [t for t in previous if t not in kept], [t for t in tracks if t not in before])
+
+    def _push_undo(self, version, op, data, cost):
+        self._undo.append((self._version, version, op, data, cost))
+        self._undo_cost += cost
+
+        while self._undo_cost > self.undo_budget and len(self._undo) > 1:
+            self._undo_cost -= self._undo.popleft()[4]
+
+    @property
+    def can_undo(self):
+        return bool(self._undo) and self._undo[-1][0] == self._version
+
+    def undo(self):
+        if not self.can_undo:
+            self._undo.clear()
+            self._undo_cost = 0
+            raise NothingToUndo
+
+        _, version, op, data, cost = self._undo.pop()
+        self._undo_cost -= cost
+
+        if op == "move":
+            track = self.remove(data[0])
+            self.insert(data[1], track)
+        elif op == "insert":
+            self.insert(data[0], *data[1])
+        elif op == "upcoming":
+            self._set_upcoming(data)
+
+        self._version = version
+        return op
+
+    def skip_to(self, index):
+        if not 0 <= index < len(self._queue) - self.position - 1:
+            raise IndexError("queue index out of range")
+
+        # Parks the position just before the target; the player's next advance lands on it.
+        self.position += index
+
+    def _invalidate_slots(self):
+        if self._slots_valid:
+            self._slots.clear()
+            self._slots_valid = False
+
+    def locate(self, track):
+        if not self._slots_valid:
+            self._slots = {t: i for i, t in enumerate(self._queue) if t is not None}
+            self._slots_valid = True
+
+        if (i := self._slots.get(track)) is None or i <= self.position:
+            return None
+        return i - self.position - 1
 
     def get_next_track(self):
-        if not self._queue:
+        if self.is_empty:
             raise QueueIsEmpty
 
         self.position += 1
 
-        if self.position < 0:
+        if self.position < self._head:
             return None
         elif self.position > len(self._queue) - 1:
             if self.repeat_mode == RepeatMode.ALL:
-                self.position = 0
+                self.position = self._head
             else:
                 return None
 
+        self._trim_history()
         return self._queue[self.position]
 
-    # def shuffle(self):
-    #     if not self._queue:
-    #         raise QueueIsEmpty
-    #
-    #     upcoming = self.upcoming
-    #     random.shuffle(upcoming)
-    #     self._queue = self._queue[:self.position + 1]
-    #     self._queue.extend(upcoming)
-    #
+    def _trim_history(self):
+        if self.repeat_mode == RepeatMode.ALL:
+            return
+
+        if (excess := self.position - self._head - self.max_history) <= 0:
+            return
+
+        trimmed = self._queue[self._head:self._head + excess]
+        for _ in range(excess):
+            if self._slots.get(self._queue[self._head]) == self._head:
+                del self._slots[self._queue[self._head]]
+            self._queue[self._head] = None
+            self._head += 1
+        self._notify("trim", excess, trimmed)
+
+        if self._head >= self.COMPACT_THRESHOLD and self._head * 2 >= len(self._queue):
+            del self._queue[:self._head]
+            self._position -= self._head
+            self._head = 0
+            self._invalidate_slots()
 
     def set_repeat_mode(self, mode):
         if mode == "off":
@@ -153,15 +467,52 @@ class Queue:
             self.repeat_mode = RepeatMode.ONE
         elif mode == "queue" or mode == "q":
             self.repeat_mode = RepeatMode.ALL
+        self._notify("repeat", self.repeat_mode.name)
 
     def empty(self):
         self._queue.clear()
+        self._slots.clear()
+        self._slots_valid = True
+        self._undo.clear()
+        self._undo_cost = 0
+        self._head = 0
+        self._position = 0
+        self._remaining_length = 0
+        self._notify("clear")
 
 
 class Player(wavelink.Player):
     def __init__(self, *args, **kwargs):
+        self.resolver = kwargs.pop("resolver", None)
+        self.journal = kwargs.pop("journal", None)
+        self.reaper = kwargs.pop("reaper", None)
+        self.loudness = kwargs.pop("loudness", None)
         super().__init__(*args, **kwargs)
         self.queue = Queue()
+        self.queue.listeners.append(self.journal_queue)
+        self.index = TrackIndex()
+        self.queue.listeners.append(self.index.listener)
+        self.view = QueueRenderer(self.queue)
+        self.ended_at = None
+        self.last_gap_ms = None
+        self.started_at = None
+        self._paused_at = None
+        self._paused_for = 0.0
+        self.autoplay = False
+        self.radio = Radio(self.resolver)
+        self.eq_preset = "flat"
+        self.timescale = "normal"
+        self.gain = 1.0
+        self.normalize = self.loudness is not None
+        self._sent_volume = self.volume
+        self._sent_filters = build_filters("flat", "normal", 1.0)
+        self._filters_task = None
+        self._filters_dirty = False
+        self._prefetch_task = None
+        self._playing_stub = None
+        self._retried = None
+        self._ingest_task = None
+        self._ingest_backlog = deque()
 
     async def connect(self, ctx, channel=None):
         if self.is_connected:
@@ -171,10 +522,137 @@ class Player(wavelink.Player):
             raise NoVoiceChannel
 
         await super().connect(channel.id)
+        self.journal_record("channel", value=channel.id)
         return channel
 
+    async def restore(self, state):
+        # Journaled as the one snapshot being restored rather than as the queue's own records, so a restore that
+        # fails part way leaves the journal as it found it.
+        journal, self.journal = self.journal, None
+        try:
+            self.queue.add(*(TrackStub.from_row(row) for row in state["tracks"]))
+            self.queue.position = min(state["position"], self.queue.length - 1)
+            self.queue.repeat_mode = RepeatMode[state["repeat"]]
+        finally:
+            self.journal = journal
+        if self.journal is not None:
+            self.journal.snapshot(self.guild_id, state)
+
+        await super().connect(state["channel"])
+        if self.journal is not None:
+            self.journal.snapshot(self.guild_id, self.state())
+
+        if state["volume"] != self.volume:
+            await self.set_volume(state["volume"])
+        await self.set_filters(state.get("eq", "flat"), state.get("timescale", "normal"))
+        await self.play(self.queue.current_track, start=state["ms"])
+        if state["paused"]:
+            await self.set_pause(True)
+
+    def state(self):
+        return {
+            "tracks": [t.as_row() for t in self.queue.tracks],
+            "position": self.queue.offset,
+            "ms": int(self.position),
+            "volume": self.volume,
+            "repeat": self.queue.repeat_mode.name,
+            "channel": self.channel_id,
+            "paused": self.is_paused,
+            "eq": self.eq_preset,
+            "timescale": self.timescale,
+        }
+
+    def journal_record(self, op, **data):
+        if self.journal is not None:
+            self.journal.record(self.guild_id, op, **data)
+
+    def journal_queue(self, event, *args):
+        if self.journal is None:
+            return
+
+        if event == "add":
+            self.journal_record("add", tracks=[t.as_row() for t in args[0]])
+        elif event == "insert":
+            self.journal_record("insert", at=args[0], tracks=[t.as_row() for t in args[1]])
+        elif event == "remove":
+            self.journal_record("remove", at=args[0], count=args[1])
+        elif event == "trim":
+            self.journal_record("trim", count=args[0])
+        elif event == "clear":
+            self.journal_record("clear")
+        elif event == "repeat":
+            self.journal_record("repeat", value=args[0])
+        elif event not in ("advance", "rewind"):
+            self.journal.snapshot(self.guild_id, self.state())
+
+    async def set_volume(self, vol):
+        self.volume = max(min(vol, 1000), 0)
+        self.journal_record("volume", value=self.volume)
+        self.schedule_filters()
+
+    async def set_filters(self, eq=None, timescale=None):
+        if eq is not None and eq != self.eq_preset:
+            self.eq_preset = eq
+            self.journal_record("eq", value=eq)
+        if timescale is not None and timescale != self.timescale:
+            self.timescale = timescale
+            self.journal_record("timescale", value=timescale)
+        self.schedule_filters()
+
+    def schedule_filters(self):
+        self._filters_dirty = True
+        if self._filters_task is None or self._filters_task.done():
+            self._filters_task = self.bot.loop.create_task(self.flush_filters())
+
+    async def flush_filters(self, delay=FILTER_DEBOUNCE):
+        # Every volume and filter change made within the window goes out as one update per kind.
+        while self._filters_dirty:
+            await asyncio.sleep(delay)
+            self._filters_dirty = False
+
+            if self.volume != self._sent_volume:
+                self._sent_volume = self.volume
+                await super().set_volume(self.volume)
+
+            if (payload := build_filters(self.eq_preset, self.timescale, self.gain)) is not self._sent_filters:
+                self._sent_filters = payload
+                await self.node._send(op="filters", guildId=str(self.guild_id), **payload)
+
+    async def change_node(self, identifier=None):
+        await super().change_node(identifier)
+        self._sent_volume = self.volume
+        self._sent_filters = build_filters("flat", "normal", 1.0)
+        self.schedule_filters()
+
+    async def set_pause(self, pause):
+        await super().set_pause(pause)
+        self.journal_record("paused", value=pause)
+
+        if pause and self._paused_at is None:
+            self._paused_at = time.time()
+        elif not pause and self._paused_at is not None:
+            self._paused_for += time.time() - self._paused_at
+            self._paused_at = None
+
+        if self.reaper is not None:
+            if pause:
+                self.reaper.schedule(self.guild_id, "paused")
+            else:
+                self.reaper.cancel(self.guild_id, "paused")
+
     # Stop the music
     async def teardown(self):
+        self.stop_ingest()
+        self.stop_prefetch()
+        if self._filters_task is not None:
+            self._filters_task.cancel()
+        self.queue.empty()
+        self.radio.clear()
+        if self.journal is not None:
+            self.journal.discard(self.guild_id)
+        if self.reaper is not None:
+            self.reaper.cancel(self.guild_id)
+        self.bot.outbox.forget(self.guild_id)
         try:
             await self.destroy()
         except KeyError:
@@ -184,27 +662,37 @@ class Player(wavelink.Player):
         if not tracks:
             raise NoTracksFound
 
-        if isinstance(tracks, wavelink.TrackPlaylist):
-            self.queue.add(*tracks.tracks)
+        if tracks.playlist:
+            self.queue.add(tracks.stub(0, ctx.author.id))
+            if len(tracks) > 1:
+                self._ingest_backlog.append((tracks, 1, ctx.author.id))
+                if self._ingest_task is None or self._ingest_task.done():
+                    self._ingest_task = self.bot.loop.create_task(self.ingest())
         elif len(tracks) == 1:
-            self.queue.add(tracks[0])
-            await ctx.send(f"Added {tracks[0].title} to the queue.")
+            self.queue.add(stub := tracks.stub(0, ctx.author.id))
+            await self.bot.outbox.status(ctx, f"Added {stub.title} to the queue.")
         else:
-            if (track := await self.choose_track(ctx, tracks)) is not None:
-                self.queue.add(track)
-                await ctx.send(f"Added {track.title} to the queue.")
+            if (stub := await self.choose_track(ctx, list(tracks.stubs(0, 5, ctx.author.id)))) is not None:
+                self.queue.add(stub)
+                await self.bot.outbox.status(ctx, f"Added {stub.title} to the queue.")
 
         if not self.is_playing and not self.queue.is_empty:
             await self.start_playback()
 
-    async def choose_track(self, ctx, tracks):
-        def _check(r, u):
-            return (
-                    r.emoji in OPTIONS.keys()
-                    and u == ctx.author
-                    and r.message.id == msg.id
-            )
+    async def ingest(self):
+        while self._ingest_backlog:
+            tracks, start, requester = self._ingest_backlog.popleft()
+            for i in range(start, len(tracks), INGEST_CHUNK_SIZE):
+                self.queue.add(*tracks.stubs(i, i + INGEST_CHUNK_SIZE, requester))
+                await asyncio.sleep(0)
 
+    def stop_ingest(self):
+        self._ingest_backlog.clear()
+        if self._ingest_task is not None and not self._ingest_task.done():
+            self._ingest_task.cancel()
+        self._ingest_task = None
+
+    async def choose_track(self, ctx, tracks):
         embed = discord.Embed(
             title="Choose a song",
             description=(
@@ -222,27 +710,160 @@ class Player(wavelink.Player):
 
         msg = await ctx.send(embed=embed)
 
-        for emoji in list(OPTIONS.keys())[:min(len(tracks), len(OPTIONS))]:
+        emojis = list(OPTIONS.keys())[:min(len(tracks), len(OPTIONS))]
+        for emoji in emojis:
             await msg.add_reaction(emoji)
 
+        emoji = await self.bot.menus.wait(msg, ctx.author, emojis, timeout=60.0)
+        await msg.delete()
+
+        if emoji is None:
+            await ctx.message.delete()
+            return None
+
+        return tracks[OPTIONS[emoji]]
+
+    async def play(self, track, **kwargs):
+        if isinstance(track, TrackStub):
+            if not track.id or track.is_stale(TRACK_MAX_AGE):
+                await self.revalidate(track)
+            if self._playing_stub is not None and self._playing_stub is not track:
+                self._playing_stub.release()
+            self._playing_stub = track
+            self.radio.remember(track.identifier)
+            await self.apply_gain(track)
+            track = track.resolve()
+
+        await super().play(track, **kwargs)
+        self.journal_record("play", position=self.queue.offset, ms=kwargs.get("start", 0))
+        self.schedule_prefetch()
+
+    async def apply_gain(self, stub):
+        gain = 1.0
+        if self.normalize and self.loudness is not None:
+            if (gain := self.loudness.gain(stub.identifier)) is None:
+                self.loudness.request(stub)
+                gain = 1.0
+
+        if gain != self.gain:
+            # Sent straight away rather than debounced so the new track never starts at the old gain.
+            self.gain = gain
+            self._filters_dirty = True
+            await self.flush_filters(delay=0)
+
+    def schedule_prefetch(self):
+        self.stop_prefetch()
+        self._prefetch_task = self.bot.loop.create_task(self.prefetch())
+
+    def stop_prefetch(self):
+        if self._prefetch_task is not None and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetch_task = None
+
+    async def prefetch(self, count=PREFETCH_COUNT):
         try:
-            reaction, _ = await self.bot.wait_for("reaction_add", timeout=60.0, check=_check)
-        except asyncio.TimeoutError:
-            await msg.delete() + 1
-            await ctx.message.delete() + 1
-        else:
-            await msg.delete() + 1
-            return tracks[OPTIONS[reaction.emoji]]
+            window = self.queue.window(0, count)
+        except QueueIsEmpty:
+            return
+
+        if self.queue.repeat_mode == RepeatMode.ALL and len(window) < count:
+            window.extend(self.queue.history[:count - len(window)])
+
+        for stub in window:
+            if not isinstance(stub, TrackStub):
+                continue
+            if not stub.id or stub.is_stale(TRACK_MAX_AGE):
+                await self.revalidate(stub)
+            if stub.id:
+                stub.resolve()
+            if self.normalize and self.loudness is not None:
+                self.loudness.request(stub)
+
+        if self.autoplay and self.queue.repeat_mode == RepeatMode.NONE and len(window) < count:
+            await self.radio.refill(self.autoplay_seeds())
+
+    def autoplay_seeds(self):
+        seeds = [self._playing_stub] if self._playing_stub is not None else []
+        try:
+            seeds.extend(reversed(self.queue.history[-SEED_COUNT:]))
+        except QueueIsEmpty:
+            pass
+        return seeds
+
+    async def revalidate(self, stub, refresh=False):
+        if self.resolver is None or not stub.uri:
+            return False
+
+        try:
+            tracks = await self.resolver(stub.uri, refresh=refresh)
+        except Exception:
+            return False
+
+        if not tracks:
+            return False
+
+        stub.release()
+        stub.id = tracks.rows[0][0]
+        stub.loaded_at = tracks.loaded_at
+        return True
+
+    async def retry_failed(self):
+        # A track Lavalink could not load is resolved again, bypassing the cache, and played once more.
+        if (stub := self._playing_stub) is None or stub is self._retried:
+            return False
+        if not await self.revalidate(stub, refresh=True):
+            return False
+
+        self._retried = stub
+        await self.play(stub)
+        return True
 
     async def start_playback(self):
         await self.play(self.queue.first_track)
 
+    @property
+    def playing_stub(self):
+        return self._playing_stub
+
+    def track_ended(self):
+        self.ended_at = time.perf_counter()
+
+    def start_clock(self):
+        self.started_at = time.time()
+        self._paused_at = self.started_at if self.is_paused else None
+        self._paused_for = 0.0
+
+    def listened(self):
+        # Wall clock since the track started, less time spent paused. wavelink clears `current` before the end
+        # event reaches listeners, so `position` is always 0 by then.
+        now = time.time()
+        paused = self._paused_for + (now - self._paused_at if self._paused_at is not None else 0.0)
+        return max(0, int((now - self.started_at - paused) * 1000))
+
+    def track_started(self):
+        if self.ended_at is None:
+            return None
+
+        self.last_gap_ms = (time.perf_counter() - self.ended_at) * 1000
+        self.ended_at = None
+        return self.last_gap_ms
+
     async def advance(self):
         try:
             if (track := self.queue.get_next_track()) is not None:
                 await self.play(track)
+                return
         except QueueIsEmpty:
-            pass
+            self.ended_at = None
+            return
+
+        if self.autoplay and self.queue.repeat_mode == RepeatMode.NONE:
+            if (stub := await self.radio.next(self.autoplay_seeds())) is not None:
+                self.queue.add(stub)
+                await self.play(self.queue.current_track)
+                return
+
+        self.ended_at = None
 
     async def repeat_track(self):
         await self.play(self.queue.current_track)
@@ -252,23 +873,142 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
     def __init__(self, bot):
         self.bot = bot
         self.wavelink = wavelink.Client(bot=bot)
+        self.track_cache = TrackCache(path=f"data/track_cache{bot.file_suffix}.json")
+        self.track_cache.load()
+        self.track_gaps = deque(maxlen=1000)
+        self.tracks_started = 0
+        self.persist_track_cache.start()
+        self.node_pool = NodePool(self.wavelink, bot.config["nodes"], metrics=bot.metrics, **bot.config["node_pool"])
+        self.journal = StateJournal()
+        self.history = HistoryStore(f"data/history{bot.file_suffix}.db")
+        self.reaper = IdleReaper(self.reclaim_player, bot.config["idle"])
+        self.reaper.start(self.bot.loop)
+        self.loudness = None
+        self.reclaimed_players = 0
+        self.reclaimed_tracks = 0
+        self.register_metrics()
         self.bot.loop.create_task(self.start_nodes())
 
+    def register_metrics(self):
+        metrics = self.bot.metrics
+        metrics.describe("lavalink_request_seconds", "Lavalink REST request latency.")
+        metrics.describe("track_gap_seconds", "Silence between a track ending and the next one starting.")
+        metrics.gauge("music_players", lambda: len(self.wavelink.players))
+        metrics.gauge("music_players_playing", lambda: sum(1 for p in self.wavelink.players.values() if p.is_playing))
+        metrics.gauge("music_tracks_started", lambda: self.tracks_started)
+        for stat in ("size", "tracks", "hits", "misses", "coalesced", "hit_ratio"):
+            metrics.gauge(f"track_cache_{stat}", lambda stat=stat: self.track_cache.stats[stat])
+        metrics.gauge("lavalink_node_migrations", lambda: self.node_pool.migrations)
+        metrics.gauge("idle_timers", lambda: len(self.reaper))
+        metrics.gauge("idle_reclaimed_players", lambda: self.reclaimed_players)
+        metrics.gauge("idle_reclaimed_tracks", lambda: self.reclaimed_tracks)
+        metrics.gauge("loudness_cache_size", lambda: len(self.loudness) if self.loudness is not None else 0)
+        metrics.gauge("loudness_analyzed", lambda: self.loudness.analyzed if self.loudness is not None else 0)
+        metrics.gauge("loudness_failed", lambda: self.loudness.failed if self.loudness is not None else 0)
+        metrics.gauge("loudness_dropped", lambda: self.loudness.dropped if self.loudness is not None else 0)
+
+    def cog_unload(self):
+        self.node_pool.stop()
+        self.reaper.stop()
+        if self.loudness is not None:
+            self.loudness.stop()
+        self.checkpoint_players.cancel()
+        self.journal.close()
+        self.history.close()
+        self.persist_track_cache.cancel()
+        self.track_cache.save()
+
+    @tasks.loop(minutes=5.0)
+    async def persist_track_cache(self):
+        entries = self.track_cache.dump()
+        await self.bot.loop.run_in_executor(None, self.track_cache.save, entries)
+
+    @tasks.loop(seconds=5.0)
+    async def checkpoint_players(self):
+        for player in self.wavelink.players.values():
+            if isinstance(player, Player) and player.is_playing:
+                player.journal_record("ms", value=int(player.position))
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
-        if not member.bot and after.channel is None:
+        if member.bot or before.channel == after.channel:
+            return
+
+        if (player := self.find_player(member.guild.id)) is None or player.channel_id is None:
+            return
+
+        if after.channel is not None and after.channel.id == int(player.channel_id):
+            self.reaper.cancel(member.guild.id, "empty")
+        elif before.channel is not None and before.channel.id == int(player.channel_id):
             if not [m for m in before.channel.members if not m.bot]:
-                # await self.get_player(member.guild).teardown()
-                pass
+                self.reaper.schedule(member.guild.id, "empty")
+
+    async def reclaim_player(self, guild_id, reason):
+        if (player := self.find_player(guild_id)) is None:
+            return
+
+        if reason == "empty":
+            channel = self.bot.get_channel(int(player.channel_id)) if player.channel_id else None
+            if channel is not None and [m for m in channel.members if not m.bot]:
+                return
+        elif reason == "paused" and not player.is_paused:
+            return
+
+        tracks = player.queue.length
+        await player.teardown()
+        self.reclaimed_players += 1
+        self.reclaimed_tracks += tracks
+        log.info("Reclaimed idle player (%s), freed %d queued tracks", reason, tracks,
+                 extra={"guild": guild_id, "reason": reason, "tracks": tracks})
 
     @wavelink.WavelinkMixin.listener()
     async def on_node_ready(self, node):
-        print(f"Wavelink node {node.identifier} ready.")
+        log.info("Wavelink node %s ready", node.identifier, extra={"node": node.identifier})
+        self.bot.metrics.gauge("lavalink_node_penalty", lambda: node_penalty(node), node=node.identifier)
+        self.bot.metrics.gauge("lavalink_node_players", lambda: len(node.players), node=node.identifier)
+        health = self.node_pool.health_of(node)
+        self.bot.metrics.gauge("lavalink_node_latency_seconds", lambda: health.latency or 0.0, node=node.identifier)
+        self.bot.metrics.gauge("lavalink_node_breaker_open",
+                               lambda: health.breaker.state != "closed", node=node.identifier)
+
+    @wavelink.WavelinkMixin.listener()
+    async def on_track_start(self, node, payload):
+        player = payload.player
+        self.tracks_started += 1
+        if (gap := player.track_started()) is not None:
+            self.track_gaps.append(gap)
+            self.bot.metrics.observe("track_gap_seconds", gap / 1000)
+
+        if (stub := player.playing_stub) is not None:
+            player.start_clock()
+            self.history.track_started(player.guild_id, stub, stub.requester, player.started_at)
+            log.info("Track started", extra={"event": "track_start", "guild": player.guild_id,
+                                             "track": stub.identifier, "node": player.node.identifier})
 
     @wavelink.WavelinkMixin.listener("on_track_stuck")
     @wavelink.WavelinkMixin.listener("on_track_end")
     @wavelink.WavelinkMixin.listener("on_track_exception")
-    async def on_player_stop(self, payload):
+    async def on_player_stop(self, node, payload):
+        player = payload.player
+        if isinstance(payload, wavelink.TrackException):
+            # Lavalink follows every exception with a TrackEnd (LOAD_FAILED), which records and advances.
+            log.warning("Track failed: %s", payload.error, extra={"guild": player.guild_id})
+            return
+
+        if player.started_at is not None and (stub := player.playing_stub) is not None:
+            listened = player.listened() if stub.is_stream else min(player.listened(), stub.length)
+            self.history.track_ended(player.guild_id, stub.identifier, player.started_at, listened)
+            player.started_at = None
+            log.log(logging.INFO if isinstance(payload, wavelink.TrackEnd) else logging.WARNING,
+                    "Track ended (%s)", type(payload).__name__,
+                    extra={"event": "track_end", "guild": player.guild_id, "track": stub.identifier,
+                           "reason": getattr(payload, "reason", None),
+                           "listened_ms": int(listened)})
+
+        if getattr(payload, "reason", None) == "LOAD_FAILED" and await player.retry_failed():
+            return
+
+        payload.player.track_ended()
         if payload.player.queue.repeat_mode == RepeatMode.ONE:
             await payload.player.repeat_track()
         else:
@@ -276,52 +1016,124 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
 
     async def cog_check(self, ctx):
         if isinstance(ctx.channel, discord.DMChannel):
-            await ctx.send("Music commands are not available in DMs")
+            await self.bot.outbox.error(ctx, "Music commands are not available in DMs")
             return False
         return True
 
     async def start_nodes(self):
+        startup = self.bot.startup
+
+        # Local storage doesn't need the gateway and is opened while it connects. Lavalink nodes can't be:
+        # wavelink's initiate_node waits for READY itself, as it needs the bot's user id.
+        with startup.phase("storage"):
+            self.journal.start()
+            await self.history.start()
+            await self.start_loudness()
+
         await self.bot.wait_until_ready()
+        with startup.phase("lavalink"):
+            await self.node_pool.start()
+        with startup.phase("recovery"):
+            await self.recover_players()
+        self.checkpoint_players.start()
+        self.bot.startup_complete()
+
+    async def start_loudness(self):
+        options = dict(self.bot.config["loudness"])
+        # Availability imports NumPy, so it is checked off the event loop.
+        if options.pop("enabled") and await self.bot.loop.run_in_executor(None, LoudnessAnalyzer.available):
+            self.loudness = LoudnessAnalyzer(**options)
+            self.loudness.start(self.bot.loop)
+
+    async def recover_players(self):
+        start = time.perf_counter()
+        states = await self.bot.loop.run_in_executor(None, self.journal.load_all)
+        results = await asyncio.gather(
+            *(self.recover_player(guild_id, state) for guild_id, state in states.items()),
+            return_exceptions=True
+        )
 
-        nodes = {
-            "MAIN": {
-                "host": "127.0.0.1",
-                "port": 2333,
-                "rest_uri": "http://127.0.0.1:2333",
-                "password": "youshallnotpass",
-                "identifier": "MAIN",
-                "region": "europe",
-            }
-        }
+        recovered = sum(1 for r in results if r is True)
+        log.info("Recovered %d/%d players", recovered, len(states),
+                 extra={"recovered": recovered, "latency_ms": round((time.perf_counter() - start) * 1000)})
+
+    async def recover_player(self, guild_id, state):
+        if not self.bot.owns_guild(guild_id):
+            return False
 
-        for node in nodes.values():
-            await self.wavelink.initiate_node(**node)
+        # A command got there first; that player's queue is the live one, and its journal has started over.
+        if self.find_player(guild_id) is not None:
+            return False
+
+        if (guild := self.bot.get_guild(guild_id)) is None or guild.get_channel(state["channel"]) is None:
+            self.journal.discard(guild_id)
+            return False
+
+        await self.get_player(guild).restore(state)
+        return True
+
+    def find_player(self, guild_id):
+        for node in self.wavelink.nodes.values():
+            if (player := node.players.get(guild_id)) is not None:
+                return player
+        return None
 
     def get_player(self, obj):
+        guild_id = obj.guild.id if isinstance(obj, commands.Context) else obj.id
+        if (player := self.find_player(guild_id)) is not None:
+            return player
+
+        # Only a new player needs a node; wavelink's own lookup merges every node's players on each call.
+        node = self.node_pool.best_node()
+        kwargs = {
+            "cls": Player,
+            "node_id": node.identifier if node is not None else None,
+            "resolver": self.resolve_tracks,
+            "journal": self.journal,
+            "reaper": self.reaper,
+            "loudness": self.loudness,
+        }
+
         if isinstance(obj, commands.Context):
-            return self.wavelink.get_player(obj.guild.id, cls=Player, context=obj)
+            player = self.wavelink.get_player(guild_id, context=obj, **kwargs)
         elif isinstance(obj, discord.Guild):
-            return self.wavelink.get_player(obj.id, cls=Player)
+            player = self.wavelink.get_player(guild_id, **kwargs)
+        else:
+            return None
+
+        # A new player starts its journal over; records appended to what an earlier run left there would replay
+        # on top of the old queue.
+        self.journal.snapshot(guild_id, empty_state())
+        if node is not None:
+            self.node_pool.assigned(node)
+        return player
+
+    async def load_tracks(self, query):
+        with self.bot.metrics.timer("lavalink_request_seconds", op="loadtracks"):
+            return await self.node_pool.load_tracks(query)
+
+    async def resolve_tracks(self, query, refresh=False):
+        return await self.track_cache.get_tracks(self.load_tracks, query, refresh)
 
     # @slash.slash(name = "connect", guild_ids=[890657274236915712] ,description = "Connect the bot to the channel")
     @commands.command(name="connect", aliases=["join"])
     async def connect_command(self, ctx, *, channel: t.Optional[discord.VoiceChannel]):
         player = self.get_player(ctx)
         channel = await player.connect(ctx, channel)
-        await ctx.send(f"Connect to {channel.name}.")
+        await self.bot.outbox.status(ctx, f"Connect to {channel.name}.")
 
     @connect_command.error
     async def connect_command_error(self, ctx, exc):
         if isinstance(exc, AlreadyConnectedToChannel):
-            await ctx.send(f"Already connected to a voice channel.")
+            await self.bot.outbox.error(ctx, f"Already connected to a voice channel.")
         elif isinstance(exc, NoVoiceChannel):
-            await ctx.send("No suitable voice channel was provided.")
+            await self.bot.outbox.error(ctx, "No suitable voice channel was provided.")
 
     @commands.command(name="disconnect", aliases=["leave", "lv"])
     async def disconnect_command(self, ctx):
         player = self.get_player(ctx)
         await player.teardown()
-        await ctx.send("Disconnect.")
+        await self.bot.outbox.status(ctx, "Disconnect.")
 
     @commands.command(name="play")
     async def play_command(self, ctx, *, query: t.Optional[str]):
@@ -333,21 +1145,21 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
         # Resume the music
         if query is None:
             await player.set_pause(False)
-            await ctx.send("Music resumed")
+            await self.bot.outbox.status(ctx, "Music resumed")
 
         else:
             query = query.strip(" ")
             if not re.match(URL_REGEX, query):
                 query = f"ytsearch:{query}"
 
-            await player.add_tracks(ctx, await self.wavelink.get_tracks(query))
+            await player.add_tracks(ctx, await self.resolve_tracks(query))
 
     @play_command.error
     async def play_command_error(self, ctx, exc):
         if isinstance(exc, PlayerIsAlreadyPlaying):
-            await ctx.send("Already playing")
+            await self.bot.outbox.error(ctx, "Already playing")
         elif isinstance(exc, QueueIsEmpty):
-            await ctx.send("No songs to play because the queue is empty")
+            await self.bot.outbox.error(ctx, "No songs to play because the queue is empty")
 
     @commands.command(name="resume", aliases=["rs"])
     async def resume_command(self, ctx, *, query: t.Optional[str]):
@@ -355,14 +1167,14 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
         # Resume the music
         if query is None:
             await player.set_pause(False)
-            await ctx.send("Music resumed")
+            await self.bot.outbox.status(ctx, "Music resumed")
 
-    @play_command.error
+    @resume_command.error
     async def resume_command_error(self, ctx, exc):
         if isinstance(exc, PlayerIsAlreadyPlaying):
-            await ctx.send("Music is already playing")
+            await self.bot.outbox.error(ctx, "Music is already playing")
         elif isinstance(exc, QueueIsEmpty):
-            await ctx.send("No songs to play because the queue is empty")
+            await self.bot.outbox.error(ctx, "No songs to play because the queue is empty")
 
     @commands.command(name="pause", aliases=["p"])
     async def pause_command(self, ctx):
@@ -372,12 +1184,12 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
             raise PlayerIsAlreadyPaused
 
         await player.set_pause(True)
-        await ctx.send("Music paused")
+        await self.bot.outbox.status(ctx, "Music paused")
 
     @pause_command.error
     async def clear_queue_command_error(self, ctx, exc):
         if isinstance(exc, PlayerIsAlreadyPaused):
-            await ctx.send("The queue has already cleared ")
+            await self.bot.outbox.error(ctx, "The queue has already cleared ")
 
     @commands.command(name="next", aliases=["skip"])
     async def next_command(self, ctx):
@@ -387,14 +1199,14 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
             raise NoMoreTracks
 
         await player.stop()
-        await ctx.send("Playing next track in queue")
+        await self.bot.outbox.status(ctx, "Playing next track in queue")
 
     @next_command.error
     async def next_command_error(self, ctx, exc):
         if isinstance(exc, QueueIsEmpty):
-            await ctx.send("Cannot skip because the queue is empty")
+            await self.bot.outbox.error(ctx, "Cannot skip because the queue is empty")
         elif isinstance(exc, NoMoreTracks):
-            await ctx.send("There are no more tracks in the queue to play")
+            await self.bot.outbox.error(ctx, "There are no more tracks in the queue to play")
 
     @commands.command(name="previous")
     async def previous_command(self, ctx):
@@ -405,25 +1217,245 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
 
         player.queue.position -= 2
         await player.stop()
-        await ctx.send("Playing previous track in queue")
+        await self.bot.outbox.status(ctx, "Playing previous track in queue")
 
     @previous_command.error
     async def previous_command_error(self, ctx, exc):
         if isinstance(exc, QueueIsEmpty):
-            await ctx.send("Cannot see the previous tracks because the queue is empty")
+            await self.bot.outbox.error(ctx, "Cannot see the previous tracks because the queue is empty")
         elif isinstance(exc, NoPreviousTracks):
-            await ctx.send("There are no more tracks in the queue to play")
-
-    # @commands.command(name="shuffle",aliases=["shlf","sh"])
-    # async def shuffle_command(self, ctx):
-    #     player = self.get_player(ctx)
-    #     player.queue.shuffle()
-    #     await ctx.send("Queue shuffled.")
-    #
-    # @shuffle_command.error
-    # async def shuffle_command_error(self, ctx, exc):
-    #     if isinstance(exc, QueueIsEmpty):
-    #         await ctx.send("The queue could not be shuffled as it is currently empty.")
+            await self.bot.outbox.error(ctx, "There are no more tracks in the queue to play")
+
+    @commands.command(name="shuffle", aliases=["shlf", "sh"])
+    async def shuffle_command(self, ctx):
+        player = self.get_player(ctx)
+        player.queue.shuffle()
+        await self.bot.outbox.status(ctx, "Queue shuffled.")
+
+    @shuffle_command.error
+    async def shuffle_command_error(self, ctx, exc):
+        if isinstance(exc, QueueIsEmpty):
+            await self.bot.outbox.error(ctx, "The queue could not be shuffled as it is currently empty.")
+
+    def find_upcoming(self, player, query, limit=FIND_LIMIT):
+        if player.queue.is_empty:
+            raise QueueIsEmpty
+
+        # The index only holds upcoming tracks, so every match it ranks can be shown.
+        matches = [(index, track) for track in player.index.search(query, limit)
+                   if (index := player.queue.locate(track)) is not None]
+        if not matches:
+            raise NoMatchingTracks
+        return matches
+
+    @commands.command(name="remove", aliases=["rm"])
+    async def remove_command(self, ctx, *, target: str):
+        player = self.get_player(ctx)
+
+        if (match := INDEX_REGEX.match(target.strip())) is None:
+            index, track = self.find_upcoming(player, target, 1)[0]
+            player.queue.remove_range(index, index + 1)
+            await self.bot.outbox.status(ctx, f"Removed {track.title} from the queue.")
+            return
+
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if not 0 < start <= end:
+            raise NoMoreTracks
+
+        try:
+            removed = player.queue.remove_range(start - 1, end)
+        except IndexError:
+            raise NoMoreTracks
+
+        if len(removed) == 1:
+            await self.bot.outbox.status(ctx, f"Removed {removed[0].title} from the queue.")
+        else:
+            await self.bot.outbox.status(ctx, f"Removed {len(removed):,} tracks from the queue.")
+
+    @remove_command.error
+    async def remove_command_error(self, ctx, exc):
+        if isinstance(exc, QueueIsEmpty):
+            await self.bot.outbox.error(ctx, "There are no tracks in the queue.")
+        elif isinstance(exc, NoMoreTracks):
+            await self.bot.outbox.error(ctx, "That index is out of the bounds of the queue.")
+        elif isinstance(exc, NoMatchingTracks):
+            await self.bot.outbox.error(ctx, "No upcoming track matches that title or artist.")
+
+    @commands.command(name="find", aliases=["search"])
+    async def find_command(self, ctx, *, query: str):
+        player = self.get_player(ctx)
+        matches = self.find_upcoming(player, query)
+
+        embed = discord.Embed(
+            title="Matching tracks",
+            description="\n".join(f"**{index + 1}.** {track.title} - {track.author}" for index, track in matches),
+            colour=ctx.author.colour,
+            timestamp=dt.datetime.utcnow(),
+        )
+        embed.set_author(name="Query Results")
+        embed.set_footer(text=f"Requested by {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
+        await ctx.send(embed=embed)
+
+    @find_command.error
+    async def find_command_error(self, ctx, exc):
+        if isinstance(exc, QueueIsEmpty):
+            await self.bot.outbox.error(ctx, "There are no tracks in the queue.")
+        elif isinstance(exc, NoMatchingTracks):
+            await self.bot.outbox.error(ctx, "No upcoming track matches that title or artist.")
+
+    @commands.command(name="removeby", aliases=["rmby"])
+    async def remove_by_command(self, ctx, member: t.Optional[discord.Member]):
+        player = self.get_player(ctx)
+        member = member or ctx.author
+
+        count = player.queue.remove_where(lambda track: track.requester == member.id)
+        await self.bot.outbox.status(ctx, f"Removed {count:,} tracks requested by {member.display_name}.")
+
+    @remove_by_command.error
+    async def remove_by_command_error(self, ctx, exc):
+        if isinstance(exc, QueueIsEmpty):
+            await self.bot.outbox.error(ctx, "There are no tracks in the queue.")
+
+    @commands.command(name="dedupe", aliases=["dedup"])
+    async def dedupe_command(self, ctx):
+        player = self.get_player(ctx)
+
+        count = player.queue.dedupe()
+        await self.bot.outbox.status(ctx, f"Removed {count:,} duplicate tracks.")
+
+    @dedupe_command.error
+    async def dedupe_command_error(self, ctx, exc):
+        if isinstance(exc, QueueIsEmpty):
+            await self.bot.outbox.error(ctx, "There are no tracks in the queue.")
+
+    @commands.command(name="move", aliases=["mv"])
+    async def move_command(self, ctx, src: int, dst: int):
+        player = self.get_player(ctx)
+
+        if src < 1 or dst < 1:
+            raise NoMoreTracks
+
+        try:
+            track, dst = player.queue.move(src - 1, dst - 1)
+        except IndexError:
+            raise NoMoreTracks
+
+        await self.bot.outbox.status(ctx, f"Moved {track.title} to position {dst + 1}.")
+
+    @move_command.error
+    async def move_command_error(self, ctx, exc):
+        if isinstance(exc, QueueIsEmpty):
+            await self.bot.outbox.error(ctx, "There are no tracks in the queue.")
+        elif isinstance(exc, NoMoreTracks):
+            await self.bot.outbox.error(ctx, "That index is out of the bounds of the queue.")
+
+    @commands.command(name="undo")
+    async def undo_command(self, ctx):
+        player = self.get_player(ctx)
+        player.queue.undo()
+        await self.bot.outbox.status(ctx, "Last queue change undone.")
+
+    @undo_command.error
+    async def undo_command_error(self, ctx, exc):
+        if isinstance(exc, NothingToUndo):
+            await self.bot.outbox.error(ctx, "There is nothing to undo, or the queue has changed since.")
+
+    @commands.command(name="autoplay", aliases=["radio"])
+    async def autoplay_command(self, ctx, mode: t.Optional[str]):
+        if mode not in (None, "on", "off"):
+            raise commands.BadArgument
+
+        player = self.get_player(ctx)
+        player.autoplay = not player.autoplay if mode is None else mode == "on"
+
+        if player.autoplay:
+            player.radio.remember(*await self.history.recent_identifiers(ctx.guild.id))
+            if player.is_playing:
+                player.schedule_prefetch()
+        else:
+            player.radio.clear()
+
+        await self.bot.outbox.status(ctx, f"Autoplay  ➡️  {'On' if player.autoplay else 'Off'} ...")
+
+    @autoplay_command.error
+    async def autoplay_command_error(self, ctx, exc):
+        if isinstance(exc, commands.BadArgument):
+            await self.bot.outbox.error(ctx, "Autoplay mode must be `on` or `off`.")
+
+    @commands.command(name="eq", aliases=["equalizer"])
+    async def eq_command(self, ctx, preset: str):
+        if (preset := preset.lower()) not in EQ_PRESETS:
+            raise InvalidPreset
+
+        player = self.get_player(ctx)
+        await player.set_filters(eq=preset)
+        await self.bot.outbox.status(ctx, f"Equalizer  ➡️  {preset.capitalize()} ...")
+
+    @commands.command(name="bassboost", aliases=["bb"])
+    async def bassboost_command(self, ctx):
+        player = self.get_player(ctx)
+        await player.set_filters(eq="flat" if player.eq_preset == "bassboost" else "bassboost")
+        state = "On" if player.eq_preset == "bassboost" else "Off"
+        await self.bot.outbox.status(ctx, f"Bass boost  ➡️  {state} ...")
+
+    @commands.command(name="timescale", aliases=["speed"])
+    async def timescale_command(self, ctx, preset: str):
+        if (preset := preset.lower()) not in TIMESCALE_PRESETS:
+            raise InvalidPreset
+
+        player = self.get_player(ctx)
+        await player.set_filters(timescale=preset)
+        await self.bot.outbox.status(ctx, f"Timescale  ➡️  {preset.capitalize()} ...")
+
+    @commands.command(name="nightcore", aliases=["nc"])
+    async def nightcore_command(self, ctx):
+        player = self.get_player(ctx)
+        await player.set_filters(timescale="normal" if player.timescale == "nightcore" else "nightcore")
+        await self.bot.outbox.status(ctx, f"Timescale  ➡️  {player.timescale.capitalize()} ...")
+
+    @commands.command(name="vaporwave", aliases=["vw"])
+    async def vaporwave_command(self, ctx):
+        player = self.get_player(ctx)
+        await player.set_filters(timescale="normal" if player.timescale == "vaporwave" else "vaporwave")
+        await self.bot.outbox.status(ctx, f"Timescale  ➡️  {player.timescale.capitalize()} ...")
+
+    @commands.command(name="normalize", aliases=["norm"])
+    async def normalize_command(self, ctx, mode: t.Optional[str]):
+        if mode not in (None, "on", "off"):
+            raise commands.BadArgument
+        if self.loudness is None:
+            raise NormalizationUnavailable
+
+        player = self.get_player(ctx)
+        player.normalize = not player.normalize if mode is None else mode == "on"
+        if player.playing_stub is not None:
+            await player.apply_gain(player.playing_stub)
+
+        await self.bot.outbox.status(ctx, f"Loudness normalization  ➡️  {'On' if player.normalize else 'Off'} ...")
+
+    @normalize_command.error
+    async def normalize_command_error(self, ctx, exc):
+        if isinstance(exc, commands.BadArgument):
+            await self.bot.outbox.error(ctx, "Normalization mode must be `on` or `off`.")
+        elif isinstance(exc, NormalizationUnavailable):
+            await self.bot.outbox.error(ctx, "Loudness normalization is not available on this bot.")
+
+    @commands.command(name="resetfilters", aliases=["nofilters"])
+    async def resetfilters_command(self, ctx):
+        player = self.get_player(ctx)
+        await player.set_filters(eq="flat", timescale="normal")
+        await self.bot.outbox.status(ctx, "Filters cleared.")
+
+    @eq_command.error
+    async def eq_command_error(self, ctx, exc):
+        if isinstance(exc, InvalidPreset):
+            await self.bot.outbox.error(ctx, f"The equalizer preset must be one of {', '.join(EQ_PRESETS)}.")
+
+    @timescale_command.error
+    async def timescale_command_error(self, ctx, exc):
+        if isinstance(exc, InvalidPreset):
+            await self.bot.outbox.error(ctx, f"The timescale preset must be one of {', '.join(TIMESCALE_PRESETS)}.")
 
     @commands.command(name="repeat", aliases=["rpt", "rp"])
     async def repeat_command(self, ctx, mode: str):
@@ -434,11 +1466,11 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
         player.queue.set_repeat_mode(mode)
 
         if mode == "off":
-            await ctx.send(f"RepeatMode  ➡️  Off ...")
+            await self.bot.outbox.status(ctx, f"RepeatMode  ➡️  Off ...")
         elif mode == "song":
-            await ctx.send(f"Repeating current song  ➡️  {player.queue.current_track} ...")
+            await self.bot.outbox.status(ctx, f"Repeating current song  ➡️  {player.queue.current_track} ...")
         elif mode == "queue" or mode == "q":
-            await ctx.send("RepeatMode  ➡️  Queue ...")
+            await self.bot.outbox.status(ctx, "RepeatMode  ➡️  Queue ...")
 
     @commands.command(name="restart")
     async def restart_command(self, ctx):
@@ -448,50 +1480,91 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
             raise QueueIsEmpty
 
         await player.seek(0)
-        await ctx.send("Track restarted.")
+        await self.bot.outbox.status(ctx, "Track restarted.")
 
     @restart_command.error
     async def restart_command_error(self, ctx, exc):
         if isinstance(exc, QueueIsEmpty):
-            await ctx.send("There are no tracks in the queue.")
+            await self.bot.outbox.error(ctx, "There are no tracks in the queue.")
 
-    @commands.command(name="queue", aliases=["q"], value="dfefezfzefez")
-    async def queue_command(self, ctx, show: t.Optional[int] = 10):
-        player = self.get_player(ctx)
+    def queue_embed(self, ctx, player, page):
+        total = len(player.queue.upcoming)
+        pages = max(1, -(-total // QUEUE_PAGE_SIZE))
+        page = min(max(page, 1), pages)
 
         embed = discord.Embed(
             title="Queue",
-            description=f"Showing up to next {show} tracks",
+            description=f"{total:,} upcoming tracks, {format_total(player.queue.remaining_length)} remaining",
             colour=ctx.author.colour,
             timestamp=dt.datetime.utcnow()
         )
 
+        # Once the last track has ended the position sits past the end of the queue.
+        current = player.queue.current_track if player.queue.offset < player.queue.length else None
+
         embed.set_author(name="Query Results")
-        embed.set_footer(text=f"Requested by {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
+        embed.set_footer(text=f"Page {page}/{pages} | Requested by {ctx.author.display_name}",
+                         icon_url=ctx.author.avatar_url)
         embed.add_field(
             name="Currently playing",
-            value=getattr(player.queue.current_track, "title", "No tracks currently playing."),
+            value=getattr(current, "title", "No tracks currently playing."),
             inline=False
         )
-        if upcoming := player.queue.upcoming:
+        if total:
             embed.add_field(
                 name="Next up",
-                value="\n".join("✅ " + t.title for t in upcoming[:show]),
+                value=player.view.upcoming((page - 1) * QUEUE_PAGE_SIZE, QUEUE_PAGE_SIZE),
                 inline=False
             )
 
+        return embed, page, pages
+
+    @commands.command(name="queue", aliases=["q"])
+    async def queue_command(self, ctx, page: t.Optional[int] = 1):
+        player = self.get_player(ctx)
+
+        embed, page, pages = self.queue_embed(ctx, player, page)
         msg = await ctx.send(embed=embed)
 
+        if pages == 1:
+            return
+
+        for emoji in QUEUE_CONTROLS:
+            await msg.add_reaction(emoji)
+
+        while (emoji := await self.bot.menus.wait(msg, ctx.author, QUEUE_CONTROLS, timeout=60.0,
+                                                          toggles=True)) is not None:
+            if emoji == "⏮":
+                page = 1
+            elif emoji == "◀":
+                page -= 1
+            elif emoji == "▶":
+                page += 1
+            else:
+                page = pages
+
+            try:
+                embed, page, pages = self.queue_embed(ctx, player, page)
+            except QueueIsEmpty:
+                break
+            await msg.edit(embed=embed)
+
+        try:
+            await msg.clear_reactions()
+        except discord.HTTPException:
+            pass
+
     @queue_command.error
     async def queue_command_error(self, ctx, exc):
         if isinstance(exc, QueueIsEmpty):
-            await ctx.send("The queue is currently empty.")
+            await self.bot.outbox.error(ctx, "The queue is currently empty.")
 
     @commands.command(name="clearqueue", aliases=[".clearq"])
     async def clear_queue_command(self, ctx):
         player = self.get_player(ctx)
+        player.stop_ingest()
         player.queue.empty()
-        await ctx.send("The queue has been cleared")
+        await self.bot.outbox.status(ctx, "The queue has been cleared")
 
     @commands.command(name="playing", aliases=["np"])
     async def playing_command(self, ctx):
@@ -507,44 +1580,86 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
         )
         embed.set_author(name="Playback Information")
         embed.set_footer(text=f"Requested by {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
-        embed.add_field(name="Track title", value=player.queue.current_track.title, inline=False)
-        embed.add_field(name="Artist", value=player.queue.current_track.author, inline=False)
-
-        position = divmod(player.position, 60000)
-        length = divmod(player.queue.current_track.length, 60000)
-        embed.add_field(
-            name="Position",
-            value=f"{int(position[0])}:{round(position[1] / 1000):02}/{int(length[0])}:{round(length[1] / 1000):02}",
-            inline=False
-        )
+        title, author, length = player.view.track_fields(player.queue.current_track)
+        embed.add_field(name="Track title", value=title, inline=False)
+        embed.add_field(name="Artist", value=author, inline=False)
+        embed.add_field(name="Position", value=f"{format_duration(player.position)}/{length}", inline=False)
 
         await ctx.send(embed=embed)
 
     @playing_command.error
     async def playing_command_error(self, ctx, exc):
         if isinstance(exc, PlayerIsAlreadyPaused):
-            await ctx.send("There is no track currently playing.")
+            await self.bot.outbox.error(ctx, "There is no track currently playing.")
+
+    def history_embed(self, ctx, title, lines):
+        embed = discord.Embed(
+            title=title,
+            description="\n".join(lines),
+            colour=ctx.author.colour,
+            timestamp=dt.datetime.utcnow(),
+        )
+        embed.set_author(name="Play History")
+        embed.set_footer(text=f"Requested by {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
+        return embed
+
+    @commands.command(name="top")
+    async def top_command(self, ctx, count: t.Optional[int] = 10):
+        if not (rows := await self.history.top_tracks(ctx.guild.id, max(1, min(count, 25)))):
+            raise NoHistory
+
+        lines = [f"**{i}.** {title} - {author} • {plays} plays, {format_total(listened)} listened"
+                 for i, (title, author, _, plays, listened) in enumerate(rows, 1)]
+        await ctx.send(embed=self.history_embed(ctx, "Top tracks", lines))
+
+    @commands.command(name="recent", aliases=["history"])
+    async def recent_command(self, ctx, count: t.Optional[int] = 10):
+        if not (rows := await self.history.recent(ctx.guild.id, max(1, min(count, 25)))):
+            raise NoHistory
+
+        lines = [f"**{i}.** {title} - {author} • {format_duration(listened or 0)} "
+                 f"<t:{int(started_at)}:R>{f' by <@{requester}>' if requester else ''}"
+                 for i, (title, author, requester, started_at, listened) in enumerate(rows, 1)]
+        await ctx.send(embed=self.history_embed(ctx, "Recently played", lines))
+
+    @top_command.error
+    @recent_command.error
+    async def history_command_error(self, ctx, exc):
+        if isinstance(exc, NoHistory):
+            await self.bot.outbox.error(ctx, "Nothing has been played in this server yet.")
 
     @commands.command(name="skipto")
-    async def skipto_command(self, ctx, index: int):
+    async def skipto_command(self, ctx, *, target: str):
         player = self.get_player(ctx)
 
         if player.queue.is_empty:
             raise QueueIsEmpty
 
-        if not 0 <= index <= player.queue.length:
+        if target.strip().isdigit():
+            index = int(target) - 1
+            track = None
+        else:
+            index, track = self.find_upcoming(player, target, 1)[0]
+
+        try:
+            player.queue.skip_to(index)
+        except IndexError:
             raise NoMoreTracks
 
-        player.queue.position = index - 2
         await player.stop()
-        await ctx.send(f"Playing track in position {index}.")
+        if track is None:
+            await self.bot.outbox.status(ctx, f"Playing track in position {index + 1}.")
+        else:
+            await self.bot.outbox.status(ctx, f"Playing {track.title}.")
 
     @skipto_command.error
     async def skipto_command_error(self, ctx, exc):
         if isinstance(exc, QueueIsEmpty):
-            await ctx.send("There are no tracks in the queue.")
+            await self.bot.outbox.error(ctx, "There are no tracks in the queue.")
         elif isinstance(exc, NoMoreTracks):
-            await ctx.send("That index is out of the bounds of the queue.")
+            await self.bot.outbox.error(ctx, "That index is out of the bounds of the queue.")
+        elif isinstance(exc, NoMatchingTracks):
+            await self.bot.outbox.error(ctx, "No upcoming track matches that title or artist.")
 
     @commands.group(name="volume", invoke_without_command=True)
     async def volume_group(self, ctx, volume: int):
@@ -557,14 +1672,14 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
             raise VolumeTooHigh
 
         await player.set_volume(volume)
-        await ctx.send(f"Volume set to {volume:,}%")
+        await self.bot.outbox.status(ctx, f"Volume set to {volume:,}%")
 
     @volume_group.error
     async def volume_group_error(self, ctx, exc):
         if isinstance(exc, VolumeTooLow):
-            await ctx.send("The volume must be 0% or above.")
+            await self.bot.outbox.error(ctx, "The volume must be 0% or above.")
         elif isinstance(exc, VolumeTooHigh):
-            await ctx.send("The volume must be 150% or below.")
+            await self.bot.outbox.error(ctx, "The volume must be 150% or below.")
 
     @volume_group.command(name="up", aliases=["+"])
     async def volume_up_command(self, ctx):
@@ -574,12 +1689,12 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
             raise MaxVolume
 
         await player.set_volume(value := min(player.volume + 10, 150))
-        await ctx.send(f"Volume set to {value:,}%")
+        await self.bot.outbox.status(ctx, f"Volume set to {value:,}%")
 
     @volume_up_command.error
     async def volume_up_command_error(self, ctx, exc):
         if isinstance(exc, MaxVolume):
-            await ctx.send("The player is already at max volume.")
+            await self.bot.outbox.error(ctx, "The player is already at max volume.")
 
     @volume_group.command(name="down", aliases=["d", "dw", "-"])
     async def volume_down_command(self, ctx):
@@ -589,13 +1704,14 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
             raise MinVolume
 
         await player.set_volume(value := max(0, player.volume - 10))
-        await ctx.send(f"Volume set to {value:,}%")
+        await self.bot.outbox.status(ctx, f"Volume set to {value:,}%")
 
     @volume_down_command.error
     async def volume_down_command_error(self, ctx, exc):
         if isinstance(exc, MinVolume):
-            await ctx.send("The player is already at min volume.")
+            await self.bot.outbox.error(ctx, "The player is already at min volume.")
 
 
 def setup(bot):
     bot.add_cog(Music(bot))
+
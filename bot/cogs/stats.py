@@ -0,0 +1,85 @@
+import datetime as dt
+
+import discord
+from discord.ext.commands import Cog
+from discord.ext.commands import command, is_owner
+
+from ..nodes import node_penalty
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:,.1f} ms"
+
+
+class Stats(Cog):
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @command(name="stats")
+    @is_owner()
+    async def show_stats(self, ctx):
+        metrics = self.bot.metrics
+
+        embed = discord.Embed(title="Bot statistics",
+                              colour=ctx.author.colour,
+                              timestamp=dt.datetime.utcnow()
+                              )
+        embed.add_field(name="Gateway latency", value=_ms(self.bot.latency), inline=True)
+
+        if (lag := metrics.histogram("event_loop_lag_seconds")) is not None:
+            embed.add_field(name="Loop lag p50 / p99",
+                            value=f"{_ms(lag.quantile(0.5))} / {_ms(lag.quantile(0.99))}", inline=True)
+
+        if (commands := metrics.merged("command_latency_seconds")) is not None:
+            embed.add_field(name="Commands",
+                            value=f"{commands.count:,} run, p50 {_ms(commands.quantile(0.5))}, "
+                                  f"p99 {_ms(commands.quantile(0.99))}",
+                            inline=False)
+
+        if (rest := metrics.merged("lavalink_request_seconds")) is not None:
+            embed.add_field(name="Lavalink requests",
+                            value=f"{rest.count:,} sent, p50 {_ms(rest.quantile(0.5))}, "
+                                  f"p99 {_ms(rest.quantile(0.99))}",
+                            inline=False)
+
+        if (music := self.bot.get_cog("Music")) is not None:
+            cache = music.track_cache.stats
+            embed.add_field(name="Players", value=f"{len(music.wavelink.players):,}", inline=True)
+            embed.add_field(name="Track cache",
+                            value=f"{cache['size']:,} entries, {cache['tracks']:,} tracks, "
+                                  f"{cache['hit_ratio']:.0%} hit ratio", inline=True)
+
+        embed.set_footer(text=f"Requested by {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
+        await ctx.send(embed=embed)
+
+    @command(name="nodes")
+    @is_owner()
+    async def show_nodes(self, ctx):
+        if (music := self.bot.get_cog("Music")) is None:
+            return
+
+        embed = discord.Embed(title="Lavalink nodes",
+                              colour=ctx.author.colour,
+                              timestamp=dt.datetime.utcnow()
+                              )
+
+        for node in music.wavelink.nodes.values():
+            health = music.node_pool.health_of(node)
+            latency = _ms(health.latency) if health.latency is not None else "n/a"
+            embed.add_field(name=node.identifier,
+                            value=f"{'available' if node.is_available else 'unavailable'}, "
+                                  f"breaker {health.breaker.state}\n"
+                                  f"ping {latency}, {health.failures:,} failures\n"
+                                  f"{len(node.players):,} players, penalty {node_penalty(node):,.0f}",
+                            inline=False)
+
+        if not embed.fields:
+            embed.description = "No nodes are connected."
+
+        embed.set_footer(text=f"Requested by {ctx.author.display_name}", icon_url=ctx.author.avatar_url)
+        await ctx.send(embed=embed)
+
+
+def setup(bot):
+    bot.add_cog(Stats(bot))
@@ -0,0 +1,103 @@
+import json
+from copy import deepcopy
+from pathlib import Path
+
+CONFIG_PATH = Path("data/config.json")
+LEGACY_TOKEN_PATH = Path("data/token")
+
+DEFAULTS = {
+    "token": None,
+    "nodes": [
+        {
+            "host": "127.0.0.1",
+            "port": 2333,
+            "rest_uri": "http://127.0.0.1:2333",
+            "password": "youshallnotpass",
+            "identifier": "MAIN",
+            "region": "europe",
+        }
+    ],
+    "node_pool": {
+        "check_interval": 10.0,
+        "max_penalty": 1000.0,
+        "migrate_batch": 5,
+        "ping_interval": 5.0,
+        "ping_timeout": 2.0,
+        "load_timeout": 5.0,
+        "load_retries": 2,
+        "retry_backoff": 0.25,
+        "breaker_threshold": 3,
+        "breaker_reset": 30.0,
+    },
+    "gateway": {
+        "intents": "minimal",
+    },
+    "idle": {
+        "empty": 120.0,
+        "paused": 900.0,
+    },
+    "loudness": {
+        "enabled": True,
+        "workers": 2,
+        "target": -14.0,
+        "max_boost": 6.0,
+        "max_cut": 12.0,
+        "max_seconds": 90.0,
+        "cache_size": 10000,
+        "timeout": 120.0,
+        "queue_size": 100,
+    },
+    "outbox": {
+        "channel_limit": 5,
+        "channel_per": 5.0,
+        "global_limit": 50,
+        "global_per": 1.0,
+        "status_ttl": 60.0,
+        "status_window": 5,
+    },
+    "logging": {
+        "level": "INFO",
+        "path": "data/logs/bot.jsonl",
+        "max_bytes": 10 * 1024 * 1024,
+        "backups": 5,
+        "console": "text",
+        "queue_size": 10000,
+        "levels": {
+            "discord": "WARNING",
+            "wavelink": "WARNING",
+        },
+        "sample": {
+            "track_start": 0.1,
+            "track_end": 0.1,
+        },
+    },
+    "metrics": {
+        "enabled": True,
+        "host": "127.0.0.1",
+        "port": 9100,
+        "loop_lag_interval": 0.5,
+    },
+}
+
+
+def _merge(base, override):
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def load_config(path=CONFIG_PATH):
+    config = deepcopy(DEFAULTS)
+    path = Path(path)
+
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            _merge(config, json.load(f))
+
+    if config["token"] is None and LEGACY_TOKEN_PATH.exists():
+        config["token"] = LEGACY_TOKEN_PATH.read_text(encoding="utf-8").strip()
+
+    return config
@@ -0,0 +1,40 @@
+_END = None
+
+
+class CommandTrie:
+    def __init__(self, names=()):
+        self._root = {}
+        for name in names:
+            self.add(name)
+
+    @classmethod
+    def from_commands(cls, commands):
+        trie = cls()
+        for command in commands:
+            trie.add(command.name)
+            for alias in command.aliases:
+                trie.add(alias)
+        return trie
+
+    def add(self, name):
+        node = self._root
+        for char in name.lower():
+            node = node.setdefault(char, {})
+        node[_END] = True
+
+    def match(self, content, start=0):
+        node = self._root
+        length = len(content)
+
+        while start < length and content[start].isspace():
+            start += 1
+
+        for i in range(start, length):
+            char = content[i]
+            if char.isspace():
+                return _END in node
+            if (node := node.get(char.lower())) is None:
+                return False
+
+        return _END in node
+
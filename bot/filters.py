@@ -0,0 +1,36 @@
+import functools
+
+BAND_COUNT = 15
+
+EQ_PRESETS = {
+    "flat": (),
+    "boost": ((0, -0.075), (1, 0.125), (2, 0.125), (3, 0.1), (4, 0.1), (5, 0.05), (6, 0.075),
+              (12, 0.125), (13, 0.15), (14, 0.05)),
+    "metal": ((1, 0.1), (2, 0.1), (3, 0.15), (4, 0.13), (5, 0.1), (7, 0.125), (8, 0.175), (9, 0.175),
+              (10, 0.125), (11, 0.125), (12, 0.1), (13, 0.075)),
+    "piano": ((0, -0.25), (1, -0.25), (2, -0.125), (4, 0.25), (5, 0.25), (7, -0.25), (8, -0.25),
+              (11, 0.5), (12, 0.25), (13, -0.025)),
+    "bassboost": ((0, 0.3), (1, 0.25), (2, 0.2), (3, 0.1), (4, 0.05)),
+}
+
+TIMESCALE_PRESETS = {
+    "normal": None,
+    "nightcore": (("speed", 1.2), ("pitch", 1.2), ("rate", 1.0)),
+    "vaporwave": (("speed", 0.8), ("pitch", 0.8), ("rate", 1.0)),
+}
+
+
+# Cached so a preset combination always maps to the same payload object, which lets the
+# player detect "nothing changed" with an identity check and reapply presets without rebuilding.
+@functools.lru_cache(maxsize=256)
+def build_filters(eq="flat", timescale="normal", gain=1.0):
+    gains = dict(EQ_PRESETS[eq])
+    payload = {
+        "volume": round(gain, 3),
+        "equalizer": [{"band": band, "gain": gains.get(band, 0.0)} for band in range(BAND_COUNT)],
+    }
+
+    if (scale := TIMESCALE_PRESETS[timescale]) is not None:
+        payload["timescale"] = dict(scale)
+
+    return payload
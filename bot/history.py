@@ -0,0 +1,136 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from discord.ext import tasks
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plays (
+    id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    identifier TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    requester INTEGER,
+    started_at REAL NOT NULL,
+    listened_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS plays_guild_started ON plays (guild_id, started_at DESC);
+
+CREATE TABLE IF NOT EXISTS track_stats (
+    guild_id INTEGER NOT NULL,
+    identifier TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    uri TEXT,
+    plays INTEGER NOT NULL DEFAULT 0,
+    listened_ms INTEGER NOT NULL DEFAULT 0,
+    last_played REAL,
+    PRIMARY KEY (guild_id, identifier)
+);
+CREATE INDEX IF NOT EXISTS track_stats_guild_plays ON track_stats (guild_id, plays DESC);
+"""
+
+INSERT_PLAY = (
+    "INSERT INTO plays (guild_id, identifier, title, author, requester, started_at) VALUES (?, ?, ?, ?, ?, ?)"
+)
+UPSERT_STATS = (
+    "INSERT INTO track_stats (guild_id, identifier, title, author, uri, plays, last_played) "
+    "VALUES (?, ?, ?, ?, ?, 1, ?) "
+    "ON CONFLICT (guild_id, identifier) DO UPDATE SET plays = plays + 1, title = excluded.title, "
+    "author = excluded.author, uri = excluded.uri, last_played = excluded.last_played"
+)
+UPDATE_PLAY = "UPDATE plays SET listened_ms = ? WHERE guild_id = ? AND identifier = ? AND started_at = ?"
+UPDATE_STATS = "UPDATE track_stats SET listened_ms = listened_ms + ? WHERE guild_id = ? AND identifier = ?"
+
+
+class HistoryStore:
+    def __init__(self, path="data/history.db", flush_interval=2.0):
+        self.path = Path(path)
+        self.written = 0
+        self._starts = []
+        self._ends = []
+        self._db = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self.flusher.change_interval(seconds=flush_interval)
+
+    async def start(self):
+        # The database is opened on the writer thread; the flusher has to be started from the event loop.
+        await asyncio.get_event_loop().run_in_executor(self._executor, self._open)
+        if not self.flusher.is_running():
+            self.flusher.start()
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def track_started(self, guild_id, track, requester, started_at):
+        self._starts.append((guild_id, track.identifier, track.title, track.author, track.uri, requester, started_at))
+
+    def track_ended(self, guild_id, identifier, started_at, listened_ms):
+        self._ends.append((int(listened_ms), guild_id, identifier, started_at))
+
+    @tasks.loop(seconds=2.0)
+    async def flusher(self):
+        await self.flush()
+
+    async def flush(self):
+        if not self._starts and not self._ends:
+            return
+
+        starts, ends, self._starts, self._ends = self._starts, self._ends, [], []
+        await asyncio.get_event_loop().run_in_executor(self._executor, self._write, starts, ends)
+
+    def close(self):
+        self.flusher.cancel()
+        starts, ends, self._starts, self._ends = self._starts, self._ends, [], []
+        self._executor.submit(self._write, starts, ends)
+        self._executor.submit(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _write(self, starts, ends):
+        if self._db is None or (not starts and not ends):
+            return
+
+        with self._db:
+            self._db.executemany(INSERT_PLAY, [(g, i, t, a, r, s) for g, i, t, a, _, r, s in starts])
+            self._db.executemany(UPSERT_STATS, [(g, i, t, a, u, s) for g, i, t, a, u, _, s in starts])
+            self._db.executemany(UPDATE_PLAY, ends)
+            self._db.executemany(UPDATE_STATS, [(ms, g, i) for ms, g, i, _ in ends])
+
+        self.written += len(starts) + len(ends)
+
+    def _query(self, sql, params):
+        return self._db.execute(sql, params).fetchall()
+
+    async def query(self, sql, *params):
+        # Reads share the writer thread, so they always see every batch flushed before them.
+        await self.flush()
+        return await asyncio.get_event_loop().run_in_executor(self._executor, self._query, sql, params)
+
+    async def top_tracks(self, guild_id, limit=10):
+        return await self.query(
+            "SELECT title, author, uri, plays, listened_ms FROM track_stats "
+            "WHERE guild_id = ? ORDER BY plays DESC LIMIT ?", guild_id, limit
+        )
+
+    async def recent(self, guild_id, limit=10):
+        return await self.query(
+            "SELECT title, author, requester, started_at, listened_ms FROM plays "
+            "WHERE guild_id = ? ORDER BY started_at DESC LIMIT ?", guild_id, limit
+        )
+
+    async def recent_identifiers(self, guild_id, limit=25):
+        return [row[0] for row in await self.query(
+            "SELECT identifier FROM plays WHERE guild_id = ? ORDER BY started_at DESC LIMIT ?", guild_id, limit
+        )]
+
@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import json
+
+
+async def _send(writer, message):
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+    await writer.drain()
+
+
+class IPCServer:
+    def __init__(self, host="127.0.0.1", port=8765, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.workers = {}
+        self.stats = {}
+        self._server = None
+        self._calls = {}
+        self._ids = itertools.count()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        worker = None
+
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                op = message["op"]
+
+                if op == "hello":
+                    worker = message["worker"]
+                    self.workers[worker] = writer
+                elif op == "stats":
+                    self.stats[message["worker"]] = message["data"]
+                elif op == "reply":
+                    if (future := self._calls.get(message["id"])) is not None and not future.done():
+                        future.set_result((message["worker"], message["data"]))
+                elif op == "request":
+                    asyncio.ensure_future(self._respond(writer, message))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if worker is not None and self.workers.get(worker) is writer:
+                del self.workers[worker]
+                self.stats.pop(worker, None)
+            writer.close()
+
+    async def _respond(self, writer, message):
+        data = await self.dispatch(message["action"], message.get("payload"))
+        try:
+            await _send(writer, {"op": "response", "id": message["id"], "data": data})
+        except ConnectionError:
+            pass
+
+    async def dispatch(self, action, payload):
+        if action == "stats":
+            return {str(w): s for w, s in self.stats.items()}
+        return await self.broadcast(action, payload)
+
+    async def broadcast(self, action, payload):
+        calls = []
+
+        for writer in list(self.workers.values()):
+            call_id = next(self._ids)
+            future = self._calls[call_id] = asyncio.get_event_loop().create_future()
+            calls.append((call_id, future))
+            try:
+                await _send(writer, {"op": "call", "id": call_id, "action": action, "payload": payload})
+            except ConnectionError:
+                future.cancel()
+
+        results = {}
+        for call_id, future in calls:
+            try:
+                worker, data = await asyncio.wait_for(future, self.timeout)
+                results[str(worker)] = data
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            finally:
+                self._calls.pop(call_id, None)
+
+        return results
+
+
+class IPCClient:
+    def __init__(self, worker_id, host="127.0.0.1", port=8765, timeout=10.0):
+        self.worker_id = worker_id
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.handlers = {}
+        self._writer = None
+        self._requests = {}
+        self._ids = itertools.count()
+
+    @property
+    def is_connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        await _send(self._writer, {"op": "hello", "worker": self.worker_id})
+        asyncio.ensure_future(self._listen(reader))
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def _listen(self, reader):
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+
+                if message["op"] == "response":
+                    if (future := self._requests.pop(message["id"], None)) is not None and not future.done():
+                        future.set_result(message["data"])
+                elif message["op"] == "call":
+                    asyncio.ensure_future(self._call(message))
+        except (ConnectionError, ValueError):
+            pass
+
+    async def _call(self, message):
+        if (handler := self.handlers.get(message["action"])) is None:
+            data = None
+        else:
+            try:
+                data = await handler(message.get("payload"))
+            except Exception as exc:
+                data = {"error": repr(exc)}
+
+        await _send(self._writer, {"op": "reply", "id": message["id"], "worker": self.worker_id, "data": data})
+
+    async def push_stats(self, data):
+        if self.is_connected:
+            await _send(self._writer, {"op": "stats", "worker": self.worker_id, "data": data})
+
+    async def request(self, action, payload=None):
+        request_id = next(self._ids)
+        future = self._requests[request_id] = asyncio.get_event_loop().create_future()
+
+        try:
+            await _send(self._writer, {"op": "request", "id": request_id, "action": action, "payload": payload})
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._requests.pop(request_id, None)
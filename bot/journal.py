@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from discord.ext import tasks
+
+
+def empty_state():
+    return {
+        "tracks": [],
+        "position": 0,
+        "ms": 0,
+        "volume": 100,
+        "repeat": "NONE",
+        "channel": None,
+        "paused": False,
+        "eq": "flat",
+        "timescale": "normal",
+    }
+
+
+def apply_record(state, record):
+    op = record["op"]
+
+    if op == "snapshot":
+        state.clear()
+        state.update(record["state"])
+    elif op == "add":
+        state["tracks"].extend(record["tracks"])
+    elif op == "insert":
+        at = record["at"]
+        state["tracks"][at:at] = record["tracks"]
+    elif op == "remove":
+        del state["tracks"][record["at"]:record["at"] + record["count"]]
+    elif op == "trim":
+        del state["tracks"][:record["count"]]
+        state["position"] = max(0, state["position"] - record["count"])
+    elif op == "clear":
+        state["tracks"] = []
+        state["position"] = 0
+        state["ms"] = 0
+    elif op == "play":
+        state["position"] = record["position"]
+        state["ms"] = record.get("ms", 0)
+    elif op in ("ms", "volume", "repeat", "channel", "paused", "eq", "timescale"):
+        state[op] = record["value"]
+
+    return state
+
+
+def replay(lines):
+    state = empty_state()
+    for line in lines:
+        try:
+            apply_record(state, json.loads(line))
+        except (ValueError, KeyError, IndexError, TypeError):
+            continue
+    return state
+
+
+class StateJournal:
+    def __init__(self, path="data/state", compact_size=256 * 1024, flush_interval=1.0):
+        self.path = Path(path)
+        self.compact_size = compact_size
+        self.compactions = 0
+        self._buffer = {}
+        # Size of the snapshot each journal starts with; only touched by the writer thread.
+        self._snapshot_bytes = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self.flusher.change_interval(seconds=flush_interval)
+
+    def start(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not self.flusher.is_running():
+            self.flusher.start()
+
+    def _file(self, guild_id):
+        return self.path / f"{guild_id}.jsonl"
+
+    def record(self, guild_id, op, **data):
+        data["op"] = op
+        if (records := self._buffer.get(guild_id, [])) is None:
+            records = [{"op": "snapshot", "state": empty_state()}]
+        records.append(data)
+        self._buffer[guild_id] = records
+
+    def snapshot(self, guild_id, state):
+        self._buffer[guild_id] = [{"op": "snapshot", "state": state}]
+
+    def discard(self, guild_id):
+        self._buffer[guild_id] = None
+
+    @tasks.loop(seconds=1.0)
+    async def flusher(self):
+        await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+
+        batch, self._buffer = self._buffer, {}
+        await asyncio.get_event_loop().run_in_executor(self._executor, self._write, batch)
+
+    def close(self):
+        self.flusher.cancel()
+        batch, self._buffer = self._buffer, {}
+        self._executor.submit(self._write, batch)
+        self._executor.shutdown(wait=True)
+
+    # Runs on the journal's own thread, compaction included; the event loop only swaps the buffer.
+    def _write(self, batch):
+        for guild_id, records in batch.items():
+            path = self._file(guild_id)
+
+            if records is None:
+                self._snapshot_bytes.pop(guild_id, None)
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+
+            lines = [json.dumps(r, separators=(",", ":")) + "\n" for r in records]
+            if records[0]["op"] == "snapshot":
+                mode = "w"
+                self._snapshot_bytes[guild_id] = len(lines[0])
+            else:
+                mode = "a"
+            with open(path, mode, encoding="utf-8") as f:
+                f.write("".join(lines))
+
+            # A rewrite costs about a snapshot, so a long queue is only compacted once the records appended
+            # since its snapshot weigh as much as the snapshot itself.
+            if os.path.getsize(path) > max(self.compact_size, 2 * self._snapshot_bytes.get(guild_id, 0)):
+                self._snapshot_bytes[guild_id] = self._compact(path)
+
+    def _compact(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            state = replay(f)
+
+        line = json.dumps({"op": "snapshot", "state": state}, separators=(",", ":")) + "\n"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(line)
+        tmp.replace(path)
+        self.compactions += 1
+        return len(line)
+
+    def load_all(self):
+        states = {}
+
+        for path in self.path.glob("*.jsonl"):
+            try:
+                guild_id = int(path.stem)
+                with open(path, "r", encoding="utf-8") as f:
+                    state = replay(f)
+            except (ValueError, OSError):
+                continue
+
+            if state["tracks"] and state["channel"] is not None:
+                states[guild_id] = state
+
+        return states
+
@@ -0,0 +1,676 @@
+import argparse
+import asyncio
+import datetime as dt
+import gc
+import itertools
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+import tracemalloc
+from collections import defaultdict, deque
+from pathlib import Path
+from types import SimpleNamespace
+
+import discord
+from aiohttp import web
+from discord.ext import commands
+
+from .bot import MusicBot
+from .cogs.music import QUEUE_CONTROLS, QUEUE_PAGE_SIZE
+from .journal import empty_state
+from .logs import setup_logging
+from .nodes import NodeUnavailable
+from .outbox import Outbox
+from .tracks import TrackStub
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BASE_ID = 1 << 40
+LOOP_LAG_INTERVAL = 0.05
+_snowflakes = itertools.count(BASE_ID)
+
+
+def snowflake():
+    return next(_snowflakes) << 22
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class FakeLavalink:
+    def __init__(self, host="127.0.0.1", port=0, password="loadtest", track_length=3.0, latency=0.0, error_rate=0.0,
+                 hang_rate=0.0, hang_time=30.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.track_length = track_length
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_time = hang_time
+        self.faults = defaultdict(int)
+        self.requests = defaultdict(int)
+        self._runner = None
+        self._sockets = set()
+        self._playing = {}
+
+    @property
+    def config(self):
+        return {
+            "host": self.host,
+            "port": self.port,
+            "rest_uri": f"http://{self.host}:{self.port}",
+            "password": self.password,
+            "identifier": "LOADTEST",
+            "region": "europe",
+        }
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/", self.websocket)
+        app.router.add_get("/loadtracks", self.loadtracks)
+        app.router.add_get("/version", self.version)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for handle, _ in self._playing.values():
+            handle.cancel()
+        for ws in list(self._sockets):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def track(self, identifier, title, author):
+        length = int(self.track_length * 1000 * random.uniform(0.75, 1.25))
+        return {
+            "track": f"{identifier}:{length}",
+            "info": {
+                "identifier": identifier,
+                "isSeekable": True,
+                "author": author,
+                "length": length,
+                "isStream": False,
+                "position": 0,
+                "title": title,
+                "uri": f"https://www.youtube.com/watch?v={identifier}",
+            },
+        }
+
+    async def fault(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        roll = random.random()
+        if roll < self.hang_rate:
+            self.faults["hang"] += 1
+            await asyncio.sleep(self.hang_time)
+        elif roll < self.hang_rate + self.error_rate:
+            self.faults["error"] += 1
+            return web.Response(status=500, text="injected fault")
+        return None
+
+    async def version(self, request):
+        self.requests["version"] += 1
+        if (response := await self.fault()) is not None:
+            return response
+        return web.Response(text="3.4-loadtest")
+
+    async def loadtracks(self, request):
+        self.requests["loadtracks"] += 1
+        if request.headers.get("Authorization") != self.password:
+            return web.Response(status=401)
+        if (response := await self.fault()) is not None:
+            return response
+
+        query = request.query.get("identifier", "")
+        seed = abs(hash(query)) % 10 ** 8
+
+        if "list=" in query:
+            tracks = [self.track(f"p{seed:08d}{i:03d}", f"Playlist track {i}", f"Artist {seed % 50}")
+                      for i in range(50)]
+            data = {"loadType": "PLAYLIST_LOADED", "playlistInfo": {"name": query, "selectedTrack": -1},
+                    "tracks": tracks}
+        elif query.startswith("ytsearch:"):
+            tracks = [self.track(f"s{seed:08d}{i:02d}", f"{query[9:]} {i}", f"Artist {seed % 50}") for i in range(5)]
+            data = {"loadType": "SEARCH_RESULT", "playlistInfo": {}, "tracks": tracks}
+        else:
+            identifier = query.rsplit("v=", 1)[-1][:11]
+            data = {"loadType": "TRACK_LOADED", "playlistInfo": {},
+                    "tracks": [self.track(identifier, f"Track {identifier}", f"Artist {seed % 50}")]}
+
+        return web.json_response(data)
+
+    async def websocket(self, request):
+        if request.headers.get("Authorization") != self.password:
+            return web.Response(status=401)
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        await self.send_stats(ws)
+
+        try:
+            async for message in ws:
+                await self.handle(ws, json.loads(message.data))
+        finally:
+            self._sockets.discard(ws)
+
+        return ws
+
+    async def send_stats(self, ws):
+        await ws.send_json({
+            "op": "stats",
+            "players": len(self._playing),
+            "playingPlayers": len(self._playing),
+            "uptime": 0,
+            "memory": {"free": 0, "used": 0, "allocated": 0, "reservable": 0},
+            "cpu": {"cores": 1, "systemLoad": 0.0, "lavalinkLoad": 0.0},
+            "frameStats": {"sent": 3000, "nulled": 0, "deficit": 0},
+        })
+
+    async def handle(self, ws, data):
+        op = data.get("op")
+        self.requests[op] += 1
+        guild_id = data.get("guildId")
+
+        if op == "play":
+            self.end(ws, guild_id, "REPLACED")
+            length = int(data["track"].rsplit(":", 1)[-1]) / 1000
+            handle = asyncio.get_event_loop().call_later(
+                length, lambda: asyncio.ensure_future(self.finish(ws, guild_id, data["track"]))
+            )
+            self._playing[guild_id] = (handle, data["track"])
+            await ws.send_json({"op": "event", "type": "TrackStartEvent", "guildId": guild_id,
+                                "track": data["track"]})
+            await ws.send_json({"op": "playerUpdate", "guildId": guild_id,
+                                "state": {"time": int(time.time() * 1000), "position": 0}})
+        elif op == "stop":
+            self.end(ws, guild_id, "STOPPED")
+        elif op == "destroy":
+            if (playing := self._playing.pop(guild_id, None)) is not None:
+                playing[0].cancel()
+
+    def end(self, ws, guild_id, reason):
+        if (playing := self._playing.pop(guild_id, None)) is None:
+            return
+
+        handle, track = playing
+        handle.cancel()
+        asyncio.ensure_future(ws.send_json({"op": "event", "type": "TrackEndEvent", "guildId": guild_id,
+                                            "track": track, "reason": reason}))
+
+    async def finish(self, ws, guild_id, track):
+        if self._playing.get(guild_id, (None, None))[1] != track:
+            return
+
+        del self._playing[guild_id]
+        if not ws.closed:
+            await ws.send_json({"op": "event", "type": "TrackEndEvent", "guildId": guild_id, "track": track,
+                                "reason": "FINISHED"})
+
+
+class FakeShardSocket:
+    latency = 0.0
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def voice_state(self, guild_id, channel_id, self_mute=False, self_deaf=False):
+        state = {"guild_id": str(guild_id), "channel_id": channel_id, "user_id": str(self.bot.user.id),
+                 "session_id": f"session-{guild_id}", "self_mute": self_mute, "self_deaf": self_deaf}
+        self.bot.dispatch("socket_response", {"t": "VOICE_STATE_UPDATE", "d": state})
+        if channel_id is not None:
+            self.bot.dispatch("socket_response", {"t": "VOICE_SERVER_UPDATE", "d": {
+                "guild_id": str(guild_id), "token": "loadtest", "endpoint": "localhost"
+            }})
+
+
+class FakeShard:
+    def __init__(self, shard_id, ws):
+        self.id = shard_id
+        self.ws = ws
+
+
+class FakeGateway:
+    def __init__(self, bot):
+        self.bot = bot
+        self.state = bot._connection
+        self.sent = 0
+        self.edited = 0
+        self._replies = defaultdict(deque)
+        self._install()
+
+    def _install(self):
+        self.state.user = discord.ClientUser(state=self.state, data=self.user_data(snowflake(), "loadtest", True))
+        self.bot.shard_count = self.state.shard_count = 1
+        self.bot._AutoShardedClient__shards = {0: FakeShard(0, FakeShardSocket(self.bot))}
+        self.bot.http.request = self.request
+        self.bot._ready.set()
+
+    @staticmethod
+    def user_data(user_id, name, bot=False):
+        return {"id": str(user_id), "username": name, "discriminator": "0001", "avatar": None, "bot": bot}
+
+    @staticmethod
+    def member_data(user):
+        return {"user": user, "roles": [], "joined_at": dt.datetime.utcnow().isoformat(), "deaf": False,
+                "mute": False}
+
+    def message_data(self, channel_id, guild_id, author, content, message_id=None):
+        data = {
+            "id": str(message_id or snowflake()),
+            "channel_id": str(channel_id),
+            "author": author,
+            "content": content or "",
+            "timestamp": dt.datetime.utcnow().isoformat(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        }
+        if guild_id is not None:
+            data["guild_id"] = str(guild_id)
+            data["member"] = self.member_data(author)
+        return data
+
+    def add_guild(self, users):
+        guild_id, text_id, voice_id = snowflake(), snowflake(), snowflake()
+        self.state._add_guild_from_data({
+            "id": str(guild_id),
+            "name": f"loadtest-{guild_id}",
+            "owner_id": users[0]["id"],
+            "member_count": len(users) + 1,
+            "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0}],
+            "channels": [
+                {"id": str(text_id), "type": 0, "name": "music", "position": 0},
+                {"id": str(voice_id), "type": 2, "name": "voice", "position": 1, "bitrate": 64000,
+                 "user_limit": 0},
+            ],
+            "members": [self.member_data(u) for u in users],
+            "voice_states": [],
+        })
+        return guild_id, text_id, voice_id
+
+    def inject(self, event, data):
+        self.state.parsers[event](data)
+
+    def voice(self, guild_id, channel_id, user):
+        self.inject("VOICE_STATE_UPDATE", {
+            "guild_id": str(guild_id), "channel_id": str(channel_id) if channel_id else None, "user_id": user["id"],
+            "session_id": f"session-{user['id']}", "member": self.member_data(user), "deaf": False, "mute": False,
+            "self_deaf": False, "self_mute": False, "suppress": False,
+        })
+
+    def message(self, guild_id, channel_id, user, content):
+        future = self.bot.loop.create_future()
+        self._replies[channel_id].append(future)
+        self.inject("MESSAGE_CREATE", self.message_data(channel_id, guild_id, user, content))
+        return future
+
+    def react(self, guild_id, channel_id, message_id, user, emoji):
+        future = self.bot.loop.create_future()
+        self._replies[channel_id].append(future)
+        self.inject("MESSAGE_REACTION_ADD", {
+            "user_id": user["id"], "channel_id": str(channel_id), "message_id": str(message_id),
+            "guild_id": str(guild_id), "emoji": {"id": None, "name": emoji}, "member": self.member_data(user),
+        })
+        return future
+
+    def _reply(self, channel_id, message_id):
+        replies = self._replies.get(channel_id)
+        while replies:
+            if not (future := replies.popleft()).done():
+                future.set_result(message_id)
+                return
+
+    async def request(self, route, **kwargs):
+        await asyncio.sleep(0)
+        channel_id = getattr(route, "channel_id", None)
+        payload = kwargs.get("json") or {}
+
+        if route.method == "POST" and route.path.endswith("/messages"):
+            self.sent += 1
+            data = self.message_data(channel_id, None, self.user_data(self.bot.user.id, "loadtest", True),
+                                     payload.get("content"))
+            self._reply(channel_id, int(data["id"]))
+            return data
+        elif route.method == "PATCH" and "/messages/" in route.path:
+            self.edited += 1
+            message_id = int(route.url.rsplit("/", 1)[-1])
+            self._reply(channel_id, message_id)
+            return self.message_data(channel_id, None, self.user_data(self.bot.user.id, "loadtest", True),
+                                     payload.get("content"), message_id)
+
+        return None
+
+
+class HarnessBot(MusicBot):
+    def __init__(self, log_dir, *args, **kwargs):
+        self.log_dir = Path(log_dir)
+        super().__init__(*args, shard_ids=[0], shard_count=1, **kwargs)
+        self.command_errors = 0
+        self.user_errors = 0
+        self.first_error = None
+
+    def configure_logging(self):
+        # Set up before anything logs, so a run never writes into the caller's data/logs.
+        return setup_logging(dict(self.config["logging"], path=str(self.log_dir / "bot.jsonl"), console=None))
+
+    async def on_command_error(self, ctx, exc):
+        # CommandErrors are answered by the cogs' handlers; anything else escaped a command and fails the run.
+        if isinstance(exc, commands.CommandError) and not isinstance(exc, commands.CommandInvokeError):
+            self.user_errors += 1
+            if isinstance(exc, NodeUnavailable):
+                await super().on_command_error(ctx, exc)
+            return
+
+        exc = getattr(exc, "original", exc)
+        self.command_errors += 1
+        if self.first_error is None:
+            self.first_error = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+
+
+class LoadTest:
+    def __init__(self, guilds=50, iterations=20, node=None, unthrottled=False, reply_timeout=10.0, recover=False,
+                 menus=0):
+        self.guilds = guilds
+        self.iterations = iterations
+        self.node = node or FakeLavalink()
+        self.unthrottled = unthrottled
+        self.reply_timeout = reply_timeout
+        self.recover = recover
+        self.menus = menus
+        self.menu_presses = 0
+        self.recovered = None
+        self.latencies = defaultdict(list)
+        self.timeouts = 0
+        self.first_play = None
+        self.bot = None
+        self.gateway = None
+        self._tmp = tempfile.TemporaryDirectory(prefix="musicbot-loadtest-")
+
+    async def setup(self):
+        await self.node.start()
+
+        self.bot = HarnessBot(self._tmp.name)
+        self.bot.config["nodes"] = [self.node.config]
+        self.bot.config["metrics"]["enabled"] = False
+        if self.unthrottled:
+            self.bot.remove_listener(self.bot.outbox.on_message)
+            self.bot.outbox = Outbox(self.bot, **dict(self.bot.config["outbox"], channel_limit=10 ** 6,
+                                                      global_limit=10 ** 6))
+
+        self.gateway = FakeGateway(self.bot)
+        # Sampled often enough for percentiles over a run of a few tens of seconds.
+        self.bot.loop_lag.interval = LOOP_LAG_INTERVAL
+        self.bot.setup()
+
+        # Keep the journal, history and cache of a real deployment in data/ out of the run.
+        music = self.bot.get_cog("Music")
+        tmp = Path(self._tmp.name)
+        music.journal.path = tmp / "state"
+        music.history.path = tmp / "history.db"
+        music.track_cache.path = tmp / "track_cache.json"
+        music.track_cache.clear()
+        if self.recover:
+            self.seed_journal(music)
+
+        while not music.wavelink.nodes or not all(n.is_available for n in music.wavelink.nodes.values()):
+            await asyncio.sleep(0.05)
+
+    def seed_journal(self, music, tracks=50):
+        # A journaled player per guild, as a crash leaves them, written before startup gets to recovery.
+        music.journal.path.mkdir(parents=True, exist_ok=True)
+        loaded_at = time.time()
+
+        for n in range(self.guilds):
+            user = self.gateway.user_data(snowflake(), f"listener-{n}")
+            guild_id, text_id, voice_id = self.gateway.add_guild([user])
+            self.gateway.voice(guild_id, voice_id, user)
+
+            rows = [TrackStub.row_from_data(self.node.track(f"r{n:05d}{i:05d}", f"Track {i}", f"Artist {n % 50}"))
+                    + (None, loaded_at) for i in range(tracks)]
+            state = dict(empty_state(), tracks=rows, position=random.randrange(tracks), channel=voice_id)
+            with open(music.journal.path / f"{guild_id}.jsonl", "w", encoding="utf-8") as f:
+                f.write(json.dumps({"op": "snapshot", "state": state}) + "\n")
+
+    async def wait_recovered(self):
+        music = self.bot.get_cog("Music")
+        deadline = time.perf_counter() + self.reply_timeout + self.guilds * 0.01
+        while music.tracks_started < self.guilds and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+
+        if music.tracks_started >= self.guilds:
+            self.recovered = self.bot.startup.elapsed()
+        else:
+            self.timeouts += self.guilds - music.tracks_started
+
+    async def teardown(self):
+        # Open menus (queue browsing) would otherwise keep waiting for their reaction timeouts.
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        music = self.bot.get_cog("Music")
+        if (session := getattr(music.wavelink, "session", None)) is not None:
+            await session.close()
+        self.bot.unload_extension("bot.cogs.music")
+        self.bot.loop_lag.stop()
+        self.bot.log_handler.close()
+        await self.node.stop()
+        self._tmp.cleanup()
+
+    async def command(self, name, future):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(future, self.reply_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+
+        self.latencies[name].append(time.perf_counter() - start)
+        if name == "play" and self.first_play is None:
+            self.first_play = self.bot.startup.elapsed()
+        return result
+
+    async def menu_open(self, message_id):
+        deadline = time.perf_counter() + self.reply_timeout
+        while message_id not in self.bot.menus._menus:
+            if time.perf_counter() > deadline:
+                self.timeouts += 1
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def open_menus(self):
+        # Queue browsers left open for the whole run, as users leave them, with someone pressing one of their
+        # buttons (or taking a reaction back) every 10ms.
+        gw = self.gateway
+        user = gw.user_data(snowflake(), "browser")
+        guild_id, text_id, _ = gw.add_guild([user])
+        author = SimpleNamespace(id=int(user["id"]))
+        message_ids = [snowflake() for _ in range(self.menus)]
+
+        async def browse(message_id):
+            message = SimpleNamespace(id=message_id)
+            while await self.bot.menus.wait(message, author, QUEUE_CONTROLS, timeout=3600.0, toggles=True):
+                self.menu_presses += 1
+
+        async def press():
+            while True:
+                await asyncio.sleep(0.01)
+                gw.inject(random.choice(("MESSAGE_REACTION_ADD", "MESSAGE_REACTION_REMOVE")), {
+                    "user_id": user["id"], "channel_id": str(text_id), "message_id": str(random.choice(message_ids)),
+                    "guild_id": str(guild_id), "emoji": {"id": None, "name": random.choice(QUEUE_CONTROLS)},
+                    "member": gw.member_data(user),
+                })
+
+        return [asyncio.ensure_future(browse(m)) for m in message_ids] + [asyncio.ensure_future(press())]
+
+    async def run_guild(self, n):
+        user = self.gateway.user_data(snowflake(), f"listener-{n}")
+        guild_id, text_id, voice_id = self.gateway.add_guild([user])
+        gw = self.gateway
+
+        gw.voice(guild_id, voice_id, user)
+        if n:
+            await asyncio.sleep(random.uniform(0, 0.5))
+
+        for i in range(self.iterations):
+            url = f"https://www.youtube.com/watch?v={n % 997:05d}{i % 50:06d}"
+            await self.command("play", gw.message(guild_id, text_id, user, f".play {url}"))
+
+            if i % 3 == 2:
+                await self.command("skip", gw.message(guild_id, text_id, user, ".next"))
+
+            if i % 5 == 4:
+                message_id = await self.command("queue", gw.message(guild_id, text_id, user, ".q"))
+                # Only a queue longer than one page gets the paging controls, and a reaction that arrives
+                # before the menu is listening (while the controls are still being added) is ignored.
+                player = self.bot.get_cog("Music").find_player(guild_id)
+                if player is None or player.queue.is_empty or len(player.queue.upcoming) <= QUEUE_PAGE_SIZE:
+                    continue
+                if message_id and await self.menu_open(message_id):
+                    await self.command("queue_page", gw.react(guild_id, text_id, message_id, user, "▶"))
+
+        await self.command("playing", gw.message(guild_id, text_id, user, ".np"))
+        gw.voice(guild_id, None, user)
+
+    async def run(self, trace_memory=False):
+        await self.setup()
+        gc.collect()
+        if trace_memory:
+            tracemalloc.start()
+
+        # Loop lag from here on only, not from startup.
+        self.bot.metrics.histograms.pop(("event_loop_lag_seconds", ()), None)
+        if self.menus:
+            self.open_menus()
+
+        start = time.perf_counter()
+        if self.recover:
+            await self.wait_recovered()
+        else:
+            await asyncio.gather(*(self.run_guild(n) for n in range(self.guilds)))
+        elapsed = time.perf_counter() - start
+
+        memory = tracemalloc.get_traced_memory() if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+        report = self.report(elapsed, memory)
+        await self.teardown()
+        return report
+
+    def report(self, elapsed, memory):
+        every = [v for values in self.latencies.values() for v in values]
+        music = self.bot.get_cog("Music")
+        lag = self.bot.metrics.histograms.get(("event_loop_lag_seconds", ()))
+        report = {
+            "guilds": self.guilds,
+            "commands": len(every),
+            "timeouts": self.timeouts,
+            "errors": self.bot.command_errors,
+            "user_errors": self.bot.user_errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_cmd_s": round(len(every) / elapsed, 1),
+            "latency_ms": {
+                name: {
+                    "p50": round(percentile(values, 0.5) * 1000, 2),
+                    "p99": round(percentile(values, 0.99) * 1000, 2),
+                    "mean": round(statistics.mean(values) * 1000, 2),
+                }
+                for name, values in sorted(self.latencies.items(), key=lambda kv: kv[0]) if values
+            },
+            "overall_ms": {"p50": round(percentile(every, 0.5) * 1000, 2),
+                           "p99": round(percentile(every, 0.99) * 1000, 2)},
+            "players": len(music.wavelink.players),
+            "tracks_started": music.tracks_started,
+            "track_gap_ms_p50": round(percentile(list(music.track_gaps), 0.5), 2),
+            "messages_sent": self.gateway.sent,
+            "messages_edited": self.gateway.edited,
+            "lavalink_requests": dict(self.node.requests),
+            "lavalink_faults": dict(self.node.faults),
+            "node_health": {
+                identifier: {"breaker": health.breaker.state, "failures": health.failures,
+                             "latency_ms": round((health.latency or 0.0) * 1000, 2)}
+                for identifier, health in music.node_pool.health.items()
+            },
+            "track_cache": music.track_cache.stats,
+            "open_menus": len(self.bot.menus),
+            "menu_presses": self.menu_presses,
+            # Percentiles are the upper bounds of the histogram buckets they fall in.
+            "loop_lag_ms": {
+                "p50": round(lag.quantile(0.5) * 1000, 1),
+                "p99": round(lag.quantile(0.99) * 1000, 1),
+                "mean": round(lag.sum / lag.count * 1000, 2),
+            } if lag is not None and lag.count else None,
+            "startup_ms": {
+                **{name: round(seconds * 1000, 1) for name, seconds in self.bot.startup.phases.items()},
+                "first_play_reply": round(self.first_play * 1000, 1) if self.first_play is not None else None,
+                "all_players_recovered": round(self.recovered * 1000, 1) if self.recovered is not None else None,
+            },
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None,
+        }
+        if memory is not None:
+            report["traced_memory_kb"] = {"current": memory[0] // 1024, "peak": memory[1] // 1024}
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the music bot against an in-process fake Discord "
+                                                 "gateway and Lavalink node.")
+    parser.add_argument("--guilds", type=int, default=50, help="number of simulated guilds")
+    parser.add_argument("--iterations", type=int, default=20, help="play commands per guild")
+    parser.add_argument("--track-length", type=float, default=3.0, help="mean fake track length in seconds")
+    parser.add_argument("--node-latency", type=float, default=0.0, help="added latency of /loadtracks in seconds")
+    parser.add_argument("--fault-error-rate", type=float, default=0.0, help="share of REST calls answered with 500")
+    parser.add_argument("--fault-hang-rate", type=float, default=0.0, help="share of REST calls that never answer")
+    parser.add_argument("--unthrottled", action="store_true", help="lift the outbox rate limits")
+    parser.add_argument("--trace-memory", action="store_true", help="report tracemalloc current/peak memory")
+    parser.add_argument("--recover", action="store_true",
+                        help="start with a journaled player per guild and time their recovery instead")
+    parser.add_argument("--menus", type=int, default=0, help="queue browsers to keep open during the run")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    node = FakeLavalink(track_length=args.track_length, latency=args.node_latency, error_rate=args.fault_error_rate,
+                        hang_rate=args.fault_hang_rate)
+    test = LoadTest(args.guilds, args.iterations, node, args.unthrottled, recover=args.recover, menus=args.menus)
+    report = asyncio.get_event_loop().run_until_complete(test.run(args.trace_memory))
+    print(json.dumps(report, indent=2))
+
+    if test.bot.first_error is not None:
+        print(f"{report['errors']} commands failed; first error:\n{test.bot.first_error}", file=sys.stderr)
+    if not report["tracks_started"]:
+        print("No track ever started playing.", file=sys.stderr)
+    if report["errors"] or not report["tracks_started"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from pathlib import Path
+
+RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line; anything passed through `extra=` (guild, command, latency_ms, ...) becomes a field.
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED and value is not None:
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    # Keeps a fraction of records tagged with a high-volume `event`; warnings and errors always pass.
+    def __init__(self, rates, seed=None):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+        self._random = random.Random(seed).random
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or (rate := self.rates.get(getattr(record, "event", None))) is None:
+            return True
+        if rate < 1.0 and self._random() >= rate:
+            self.sampled_out += 1
+            return False
+
+        record.sample_rate = rate
+        return True
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    # The event loop only merges the message arguments and enqueues; formatting and file I/O run on the
+    # listener thread. Past queue_size pending records, new ones are dropped and counted rather than queued.
+    def __init__(self, handlers, queue_size=10000):
+        super().__init__(queue.SimpleQueue())
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.queue_size:
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+    def start(self):
+        self.listener.start()
+
+    def close(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+
+def log_path(path, suffix=""):
+    path = Path(path)
+    return path.with_name(f"{path.stem}{suffix}{path.suffix}")
+
+
+def setup_logging(options, suffix=""):
+    # Caller, thread and process lookups are never emitted, so records skip collecting them.
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, QueueLogHandler)]:
+        root.removeHandler(handler)
+        handler.close()
+
+    handlers = []
+    if options["path"]:
+        path = log_path(options["path"], suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=options["max_bytes"], backupCount=options["backups"], encoding="utf-8", delay=True
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if options["console"]:
+        console = logging.StreamHandler(sys.stderr)
+        console.setFormatter(JsonFormatter() if options["console"] == "json" else logging.Formatter(TEXT_FORMAT))
+        handlers.append(console)
+
+    handler = QueueLogHandler(handlers, options["queue_size"])
+    handler.addFilter(SamplingFilter(options["sample"]))
+    root.addHandler(handler)
+    root.setLevel(options["level"])
+    for name, level in options["levels"].items():
+        logging.getLogger(name).setLevel(level)
+
+    handler.start()
+    return handler
+
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import math
+import shutil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+np = None
+
+SAMPLE_RATE = 22050
+BLOCK_SECONDS = 0.1
+READ_SIZE = 64 * 1024
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+
+
+def load_numpy():
+    global np
+
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+
+def loudness_of(mean_square):
+    return -0.691 + 10 * math.log10(mean_square) if mean_square > 0 else float("-inf")
+
+
+class LoudnessMeter:
+    # BS.1770-style gated loudness over 400ms blocks with 75% overlap, built from 100ms sub-block
+    # energies so PCM can be fed in arbitrary chunks and only one float per 100ms is kept. The
+    # K-weighting pre-filter is left out, so the result is an estimate rather than true LUFS.
+    def __init__(self, rate=SAMPLE_RATE):
+        self.step = int(rate * BLOCK_SECONDS)
+        self._energies = []
+        self._tail = np.empty(0, dtype=np.float32)
+        self._carry = b""
+
+    def feed(self, pcm):
+        if self._carry:
+            pcm = self._carry + pcm
+        self._carry = pcm[len(pcm) - len(pcm) % 2:]
+        samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2).astype(np.float32) / 32768.0
+        if len(self._tail):
+            samples = np.concatenate((self._tail, samples))
+
+        usable = len(samples) - len(samples) % self.step
+        if usable:
+            self._energies.append(np.square(samples[:usable]).reshape(-1, self.step).sum(axis=1))
+        self._tail = samples[usable:]
+
+    @property
+    def seconds(self):
+        return sum(len(e) for e in self._energies) * BLOCK_SECONDS
+
+    def integrated(self):
+        if not self._energies:
+            return None
+
+        energies = np.concatenate(self._energies)
+        if len(energies) < 4:
+            return None
+
+        blocks = np.convolve(energies, np.ones(4), mode="valid") / (4 * self.step)
+        blocks = blocks[blocks > 0]
+        blocks = blocks[-0.691 + 10 * np.log10(blocks) > ABSOLUTE_GATE]
+        if not len(blocks):
+            return None
+
+        relative = loudness_of(float(blocks.mean())) + RELATIVE_GATE
+        blocks = blocks[-0.691 + 10 * np.log10(blocks) > relative]
+        return loudness_of(float(blocks.mean()))
+
+
+class LoudnessAnalyzer:
+    def __init__(self, workers=2, target=-14.0, max_boost=6.0, max_cut=12.0, max_seconds=90.0, cache_size=10000,
+                 timeout=120.0, queue_size=100):
+        self.workers = workers
+        self.target = target
+        self.max_boost = max_boost
+        self.max_cut = max_cut
+        self.max_seconds = max_seconds
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.analyzed = 0
+        self.failed = 0
+        self.dropped = 0
+        self._gains = OrderedDict()
+        self._pending = set()
+        # Bounded: while the workers are behind, new tracks just play at unity gain.
+        self._queue = asyncio.Queue(queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loudness")
+        self._tasks = []
+
+    @staticmethod
+    def available():
+        return load_numpy() is not None and shutil.which("ffmpeg") is not None
+
+    def __len__(self):
+        return len(self._gains)
+
+    def start(self, loop):
+        if not self._tasks:
+            self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._executor.shutdown(wait=False)
+
+    def gain(self, identifier):
+        if (gain := self._gains.get(identifier)) is not None:
+            self._gains.move_to_end(identifier)
+        return gain
+
+    def request(self, stub):
+        if (not self._tasks or stub.is_stream or not stub.uri
+                or stub.identifier in self._gains or stub.identifier in self._pending):
+            return
+
+        try:
+            self._queue.put_nowait((stub.identifier, stub.uri))
+        except asyncio.QueueFull:
+            self.dropped += 1
+        else:
+            self._pending.add(stub.identifier)
+
+    def gain_for(self, loudness):
+        gain_db = max(-self.max_cut, min(self.max_boost, self.target - loudness))
+        return round(10 ** (gain_db / 20), 3)
+
+    def store(self, identifier, gain):
+        self._gains[identifier] = gain
+        self._gains.move_to_end(identifier)
+        while len(self._gains) > self.cache_size:
+            self._gains.popitem(last=False)
+
+    async def _work(self):
+        while True:
+            identifier, uri = await self._queue.get()
+            try:
+                # Cancelling measure kills its subprocesses, so a stalled stream can't hold a worker.
+                if (loudness := await asyncio.wait_for(self.measure(uri), self.timeout)) is not None:
+                    self.store(identifier, self.gain_for(loudness))
+                    self.analyzed += 1
+                else:
+                    self.failed += 1
+            except asyncio.TimeoutError:
+                self.failed += 1
+                log.warning("Loudness analysis timed out", extra={"track": identifier})
+            except Exception as exc:
+                self.failed += 1
+                log.warning("Loudness analysis failed: %r", exc, extra={"track": identifier})
+            finally:
+                self._pending.discard(identifier)
+
+    async def source(self, uri):
+        if shutil.which("yt-dlp") is None:
+            return uri
+
+        process = await asyncio.create_subprocess_exec(
+            "yt-dlp", "-f", "bestaudio", "-g", uri,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        try:
+            stdout, _ = await process.communicate()
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+        return stdout.decode().strip().splitlines()[0] if process.returncode == 0 and stdout.strip() else uri
+
+    async def measure(self, uri):
+        meter = LoudnessMeter()
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-t", str(self.max_seconds), "-i", await self.source(uri),
+            "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        loop = asyncio.get_event_loop()
+
+        try:
+            while chunk := await process.stdout.read(READ_SIZE):
+                await loop.run_in_executor(self._executor, meter.feed, chunk)
+        finally:
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+
+        return await loop.run_in_executor(self._executor, meter.integrated)
+
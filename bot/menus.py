@@ -0,0 +1,50 @@
+import asyncio
+
+
+class Menu:
+    __slots__ = ("message_id", "user_id", "emojis", "future", "toggles")
+
+    def __init__(self, message_id, user_id, emojis, future, toggles=False):
+        self.message_id = message_id
+        self.user_id = user_id
+        self.emojis = emojis
+        self.future = future
+        self.toggles = toggles
+
+
+class MenuManager:
+    def __init__(self, bot):
+        self.bot = bot
+        self._menus = {}
+        bot.add_listener(self.on_raw_reaction_add)
+        bot.add_listener(self.on_raw_reaction_remove)
+
+    def __len__(self):
+        return len(self._menus)
+
+    async def on_raw_reaction_add(self, payload):
+        if (menu := self._menus.get(payload.message_id)) is None:
+            return
+
+        if payload.user_id != menu.user_id or (emoji := str(payload.emoji)) not in menu.emojis:
+            return
+
+        if not menu.future.done():
+            menu.future.set_result(emoji)
+
+    async def on_raw_reaction_remove(self, payload):
+        # Taking a reaction back only presses a button on menus that leave their reactions up to be pressed again.
+        if (menu := self._menus.get(payload.message_id)) is not None and menu.toggles:
+            await self.on_raw_reaction_add(payload)
+
+    async def wait(self, message, user, emojis, timeout=60.0, toggles=False):
+        future = self.bot.loop.create_future()
+        self._menus[message.id] = Menu(message.id, user.id, frozenset(emojis), future, toggles)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if (menu := self._menus.get(message.id)) is not None and menu.future is future:
+                del self._menus[message.id]
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import random
+import time
+
+from discord.ext import commands, tasks
+
+from .tracks import TrackResults
+
+log = logging.getLogger(__name__)
+
+
+class NodeUnavailable(commands.CommandError):
+    pass
+
+
+def _frame_stat(stats, *names):
+    for name in names:
+        if (value := getattr(stats, name, None)) is not None:
+            return value
+    return -1
+
+
+def node_penalty(node):
+    playing = sum(1 for p in node.players.values() if p.is_playing)
+    stats = getattr(node, "stats", None)
+
+    if stats is None:
+        return float(playing)
+
+    playing = max(playing, stats.playing_players)
+    cpu = 1.05 ** (100 * stats.system_load) * 10 - 10
+
+    deficit = _frame_stat(stats, "frames_deficit", "deficit")
+    nulled = _frame_stat(stats, "frames_nulled", "nulled")
+    deficit_penalty = 1.03 ** (500 * deficit / 3000) * 600 - 600 if deficit >= 0 else 0
+    nulled_penalty = (1.03 ** (500 * nulled / 3000) * 300 - 300) * 2 if nulled >= 0 else 0
+
+    return playing + cpu + deficit_penalty + nulled_penalty
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        if (state := self.state) == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+    def healthy(self):
+        # Clears failures that never added up to a trip; an open breaker still waits for its trial.
+        if self.opened_at is None:
+            self.failures = 0
+
+    def end_trial(self):
+        self._trial = False
+
+
+class NodeHealth:
+    __slots__ = ("breaker", "latency", "last_ping", "pings", "failures", "penalty")
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.penalty = None
+        self.latency = None
+        self.last_ping = None
+        self.pings = 0
+        self.failures = 0
+
+    def observe(self, latency, alpha=0.3):
+        self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+        self.last_ping = time.time()
+        self.pings += 1
+
+
+class NodePool:
+    def __init__(self, client, nodes, check_interval=10.0, max_penalty=1000.0, migrate_batch=5, ping_interval=5.0,
+                 ping_timeout=2.0, load_timeout=5.0, load_retries=2, retry_backoff=0.25, breaker_threshold=3,
+                 breaker_reset=30.0, metrics=None):
+        self.client = client
+        self.nodes = list(nodes.values()) if isinstance(nodes, dict) else list(nodes)
+        self.max_penalty = max_penalty
+        self.migrate_batch = migrate_batch
+        self.ping_timeout = ping_timeout
+        self.load_timeout = load_timeout
+        self.load_retries = load_retries
+        self.retry_backoff = retry_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.metrics = metrics
+        self.migrations = 0
+        self.health = {}
+        self.monitor.change_interval(seconds=check_interval)
+        self.pinger.change_interval(seconds=ping_interval)
+
+    async def start(self):
+        results = await asyncio.gather(
+            *(self.client.initiate_node(**node) for node in self.nodes),
+            return_exceptions=True
+        )
+
+        for node, result in zip(self.nodes, results):
+            if isinstance(result, Exception):
+                log.error("Wavelink node %s failed to start: %r", node["identifier"], result,
+                          extra={"node": node["identifier"]})
+
+        self.refresh()
+
+        if not self.monitor.is_running():
+            self.monitor.start()
+        if not self.pinger.is_running():
+            self.pinger.start()
+
+    def stop(self):
+        self.monitor.cancel()
+        self.pinger.cancel()
+
+    def health_of(self, node):
+        if (health := self.health.get(node.identifier)) is None:
+            health = self.health[node.identifier] = NodeHealth(
+                CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            )
+        return health
+
+    def _count(self, name, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, **labels)
+
+    def refresh(self):
+        for node in list(self.client.nodes.values()):
+            self.health_of(node).penalty = node_penalty(node)
+
+    def penalty(self, node):
+        # As of the last monitor pass, plus the players handed to the node since; node_penalty walks every player.
+        if (health := self.health_of(node)).penalty is None:
+            health.penalty = node_penalty(node)
+        return health.penalty
+
+    def assigned(self, node):
+        self.health_of(node).penalty = self.penalty(node) + 1
+
+    def healthy_nodes(self):
+        return [n for n in self.client.nodes.values()
+                if n.is_available and self.health_of(n).breaker.state != CircuitBreaker.OPEN
+                and self.penalty(n) < self.max_penalty]
+
+    def best_node(self, exclude=None):
+        candidates = [n for n in self.healthy_nodes() if n is not exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=self.penalty)
+
+    async def migrate(self, player, node):
+        try:
+            await player.change_node(node.identifier)
+        except Exception as exc:
+            log.warning("Failed to move player to node %s: %r", node.identifier, exc,
+                        extra={"guild": player.guild_id, "node": node.identifier})
+            return False
+
+        self.migrations += 1
+        self.assigned(node)
+        return True
+
+    async def ping(self, node):
+        health = self.health_of(node)
+        start = time.perf_counter()
+
+        try:
+            async with self.client.session.get(f"{node.rest_uri}/version",
+                                               headers={"Authorization": node.password}) as resp:
+                await asyncio.wait_for(resp.read(), self.ping_timeout)
+                healthy = resp.status < 500
+        except Exception:
+            healthy = False
+
+        # A ping never closes the breaker: after breaker_reset it goes half-open on its own, and only the trial
+        # request that follows can close it, so a node that answers /version but fails loads stays out of rotation.
+        # It does clear a closed breaker's count, or failures spread over days would add up to a trip.
+        if healthy:
+            health.observe(time.perf_counter() - start)
+            health.breaker.healthy()
+        else:
+            health.failures += 1
+            health.breaker.failure()
+            self._count("lavalink_ping_failures_total", node=node.identifier)
+
+    @tasks.loop(seconds=5.0)
+    async def pinger(self):
+        await asyncio.gather(*(asyncio.wait_for(self.ping(n), self.ping_timeout * 2)
+                               for n in list(self.client.nodes.values())), return_exceptions=True)
+
+    def candidates(self, failed=()):
+        nodes = [n for n in self.client.nodes.values()
+                 if n.is_available and self.health_of(n).breaker.state != CircuitBreaker.OPEN]
+        return sorted(nodes, key=lambda n: (n.identifier in failed, self.penalty(n)))
+
+    async def fetch_tracks(self, node, query):
+        # Straight to the REST endpoint rather than Node.get_tracks, which retries non-200 answers five times with
+        # its own backoff and then reports them as "no tracks", hiding the failure from the breaker.
+        async with self.client.session.get(f"{node.rest_uri}/loadtracks", params={"identifier": query},
+                                           headers={"Authorization": node.password}) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+
+        return TrackResults.from_data(data) if data["tracks"] else None
+
+    async def load_tracks(self, query):
+        failed = set()
+
+        for attempt in range(self.load_retries + 1):
+            if attempt:
+                # Full jitter keeps retries from many guilds from landing on a recovering node together.
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+                self._count("lavalink_load_retries_total")
+
+            if (node := next((n for n in self.candidates(failed) if self.health_of(n).breaker.allow()), None)) is None:
+                self._count("lavalink_breaker_rejections_total")
+                raise NodeUnavailable
+
+            health = self.health_of(node)
+            try:
+                tracks = await asyncio.wait_for(self.fetch_tracks(node, query), self.load_timeout)
+            except Exception as exc:
+                health.failures += 1
+                health.breaker.failure()
+                failed.add(node.identifier)
+                self._count("lavalink_load_failures_total", node=node.identifier, error=type(exc).__name__)
+                continue
+            finally:
+                # A trial that was cancelled never reports back; the next request gets to be the trial instead.
+                health.breaker.end_trial()
+
+            health.breaker.success()
+            return tracks
+
+        raise NodeUnavailable
+
+    @tasks.loop(seconds=10.0)
+    async def monitor(self):
+        self.refresh()
+
+        for node in list(self.client.nodes.values()):
+            if not node.players:
+                continue
+
+            if not node.is_available:
+                players = list(node.players.values())
+            elif self.penalty(node) >= self.max_penalty:
+                players = list(node.players.values())[:self.migrate_batch]
+            else:
+                continue
+
+            for player in players:
+                if (target := self.best_node(exclude=node)) is None:
+                    return
+                await self.migrate(player, target)
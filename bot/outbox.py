@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+import discord
+
+log = logging.getLogger(__name__)
+
+PRIORITY_ERROR = 0
+PRIORITY_REPLY = 1
+PRIORITY_STATUS = 2
+
+
+class RateWindow:
+    # At most `limit` requests in any `per` seconds, timed from when each one completed. Discord opens its windows
+    # when a request reaches it, never later than that, so this can't run ahead of them whatever the latency.
+    __slots__ = ("limit", "per", "completed", "in_flight")
+
+    def __init__(self, limit, per):
+        self.limit = limit
+        self.per = per
+        self.completed = deque()
+        self.in_flight = 0
+
+    def _expire(self, now):
+        while self.completed and now - self.completed[0] >= self.per:
+            self.completed.popleft()
+
+    def delay(self):
+        now = time.monotonic()
+        self._expire(now)
+        if len(self.completed) + self.in_flight < self.limit:
+            return 0.0
+        if not self.completed:
+            return self.per / self.limit
+        return self.per - (now - self.completed[0])
+
+    def take(self):
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self.completed.append(time.monotonic())
+
+    def expires_in(self):
+        now = time.monotonic()
+        self._expire(now)
+        return self.per - (now - self.completed[-1]) if self.completed else 0.0
+
+
+class Envelope:
+    __slots__ = ("priority", "seq", "kind", "key", "channel", "content", "kwargs", "future")
+
+    def __init__(self, priority, seq, kind, key, channel, content, kwargs, future):
+        self.priority = priority
+        self.seq = seq
+        self.kind = kind
+        self.key = key
+        self.channel = channel
+        self.content = content
+        self.kwargs = kwargs
+        self.future = future
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class StatusMessage:
+    __slots__ = ("message", "sent_at", "after")
+
+    def __init__(self, message, sent_at):
+        self.message = message
+        self.sent_at = sent_at
+        self.after = 0
+
+
+class ChannelQueue:
+    __slots__ = ("heap", "window", "task")
+
+    def __init__(self, window):
+        self.heap = []
+        self.window = window
+        self.task = None
+
+
+class Outbox:
+    def __init__(self, bot, channel_limit=5, channel_per=5.0, global_limit=50, global_per=1.0, status_ttl=60.0,
+                 status_window=5):
+        self.bot = bot
+        self.channel_limit = channel_limit
+        self.channel_per = channel_per
+        self.status_ttl = status_ttl
+        self.status_window = status_window
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+        self._global = RateWindow(global_limit, global_per)
+        self._channels = {}
+        self._pending_status = {}
+        self._status = {}
+        self._status_channels = {}
+        self._seq = itertools.count()
+        bot.add_listener(self.on_message)
+
+    def __len__(self):
+        return sum(len(q.heap) for q in self._channels.values())
+
+    async def on_message(self, message):
+        # Counts what was posted below each channel's status message; the command that asked for the next status
+        # is one of them, so the channel's last message is never the status itself.
+        if (status := self._status_channels.get(message.channel.id)) is not None and message.id != status.message.id:
+            status.after += 1
+
+    def _enqueue(self, channel, content, priority, kind="send", key=None, **kwargs):
+        future = self.bot.loop.create_future()
+        envelope = Envelope(priority, next(self._seq), kind, key, channel, content, kwargs, future)
+
+        if (queue := self._channels.get(channel.id)) is None:
+            queue = self._channels[channel.id] = ChannelQueue(RateWindow(self.channel_limit, self.channel_per))
+
+        heapq.heappush(queue.heap, envelope)
+        if queue.task is None:
+            queue.task = self.bot.loop.create_task(self._drain(channel.id, queue))
+
+        return envelope
+
+    async def send(self, ctx, content=None, **kwargs):
+        return self._enqueue(ctx.channel, content, PRIORITY_REPLY, **kwargs).future
+
+    async def error(self, ctx, content):
+        return self._enqueue(ctx.channel, content, PRIORITY_ERROR).future
+
+    async def status(self, ctx, content):
+        key = ctx.guild.id if ctx.guild is not None else ctx.channel.id
+
+        if (envelope := self._pending_status.get(key)) is not None and envelope.channel.id == ctx.channel.id:
+            envelope.content = content
+            self.coalesced += 1
+            return envelope.future
+
+        envelope = self._pending_status[key] = self._enqueue(ctx.channel, content, PRIORITY_STATUS, "status", key)
+        return envelope.future
+
+    async def _drain(self, channel_id, queue):
+        try:
+            while queue.heap:
+                if (delay := max(queue.window.delay(), self._global.delay())) > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                envelope = heapq.heappop(queue.heap)
+                queue.window.take()
+                self._global.take()
+
+                try:
+                    message = await self._deliver(envelope)
+                except discord.HTTPException as exc:
+                    log.warning("Failed to deliver message: %r", exc,
+                                extra={"channel": channel_id, "status": exc.status})
+                    message = None
+                except asyncio.CancelledError:
+                    if not envelope.future.done():
+                        envelope.future.cancel()
+                    raise
+                except Exception as exc:
+                    # Anything else (a dropped connection, a timeout) fails this envelope, not the channel's queue.
+                    log.warning("Failed to deliver message: %r", exc, extra={"channel": channel_id})
+                    message = None
+                finally:
+                    queue.window.release()
+                    self._global.release()
+
+                if not envelope.future.done():
+                    envelope.future.set_result(message)
+        finally:
+            queue.task = None
+            # The channel's window outlives its queue, or a reply right after would start on a fresh one.
+            if not queue.heap:
+                self.bot.loop.call_later(queue.window.expires_in(), self._release, channel_id, queue)
+
+    def _release(self, channel_id, queue):
+        if queue.task is None and not queue.heap and self._channels.get(channel_id) is queue:
+            del self._channels[channel_id]
+
+    async def _deliver(self, envelope):
+        if envelope.kind != "status":
+            self.sent += 1
+            return await envelope.channel.send(envelope.content, **envelope.kwargs)
+
+        if self._pending_status.get(envelope.key) is envelope:
+            del self._pending_status[envelope.key]
+
+        now = time.monotonic()
+        if (status := self._status.get(envelope.key)) is not None:
+            if (status.message.channel.id == envelope.channel.id
+                    and now - status.sent_at < self.status_ttl
+                    and status.after < self.status_window):
+                try:
+                    await status.message.edit(content=envelope.content)
+                except discord.NotFound:
+                    pass
+                else:
+                    status.sent_at = now
+                    self.edited += 1
+                    return status.message
+
+        message = await envelope.channel.send(envelope.content)
+        self.forget_status(envelope.key)
+        self._status[envelope.key] = self._status_channels[envelope.channel.id] = StatusMessage(message, now)
+        self.sent += 1
+        return message
+
+    def forget_status(self, key):
+        if (status := self._status.pop(key, None)) is not None:
+            channel_id = status.message.channel.id
+            if self._status_channels.get(channel_id) is status:
+                del self._status_channels[channel_id]
+
+    def forget(self, key):
+        self.forget_status(key)
+        self._pending_status.pop(key, None)
+
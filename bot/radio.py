@@ -0,0 +1,91 @@
+import asyncio
+from collections import deque
+
+SEED_COUNT = 3
+RECENT_SIZE = 200
+POOL_SIZE = 25
+
+
+def related_queries(stub):
+    if len(stub.identifier) == 11 and stub.uri and "youtube.com" in stub.uri:
+        yield f"https://www.youtube.com/watch?v={stub.identifier}&list=RD{stub.identifier}"
+    if stub.author:
+        yield f"ytsearch:{stub.author}"
+
+
+class Radio:
+    def __init__(self, resolver, recent_size=RECENT_SIZE, pool_size=POOL_SIZE):
+        self.resolver = resolver
+        self.pool_size = pool_size
+        self._recent = deque(maxlen=recent_size)
+        self._recent_ids = set()
+        self._pool = deque()
+        self._pool_ids = set()
+        self._seeded = set()
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._pool)
+
+    def remember(self, *identifiers):
+        for identifier in identifiers:
+            if not identifier or identifier in self._recent_ids:
+                continue
+
+            if len(self._recent) == self._recent.maxlen:
+                self._recent_ids.discard(self._recent[0])
+            self._recent.append(identifier)
+            self._recent_ids.add(identifier)
+
+    def is_recent(self, identifier):
+        return identifier in self._recent_ids
+
+    def clear(self):
+        self._pool.clear()
+        self._pool_ids.clear()
+        self._seeded.clear()
+
+    async def refill(self, seeds):
+        async with self._lock:
+            for seed in seeds:
+                if len(self._pool) >= self.pool_size:
+                    return
+                if seed.identifier in self._seeded:
+                    continue
+                self._seeded.add(seed.identifier)
+
+                for query in related_queries(seed):
+                    try:
+                        tracks = await self.resolver(query)
+                    except Exception:
+                        continue
+
+                    if tracks and self._extend(tracks.stubs()):
+                        break
+
+    def _extend(self, candidates):
+        added = 0
+
+        for stub in candidates:
+            if stub.is_stream or stub.identifier in self._recent_ids or stub.identifier in self._pool_ids:
+                continue
+            self._pool.append(stub)
+            self._pool_ids.add(stub.identifier)
+            added += 1
+            if len(self._pool) >= self.pool_size:
+                break
+
+        return added
+
+    def take(self):
+        while self._pool:
+            stub = self._pool.popleft()
+            self._pool_ids.discard(stub.identifier)
+            if stub.identifier not in self._recent_ids:
+                return stub
+        return None
+
+    async def next(self, seeds):
+        if not self._pool:
+            await self.refill(seeds)
+        return self.take()
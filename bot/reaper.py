@@ -0,0 +1,76 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class IdleReaper:
+    def __init__(self, callback, graces):
+        self.callback = callback
+        self.graces = graces
+        self._heap = []
+        self._active = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._active)
+
+    def start(self, loop):
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, key, reason, delay=None):
+        if (key, reason) in self._active:
+            return
+
+        deadline = time.monotonic() + (self.graces[reason] if delay is None else delay)
+        seq = next(self._seq)
+        self._active[(key, reason)] = seq
+        heapq.heappush(self._heap, (deadline, seq, key, reason))
+
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, key, reason=None):
+        if reason is not None:
+            self._active.pop((key, reason), None)
+            return
+
+        for active in [a for a in self._active if a[0] == key]:
+            del self._active[active]
+
+    def is_scheduled(self, key, reason):
+        return (key, reason) in self._active
+
+    async def _run(self):
+        while True:
+            while self._heap and self._active.get(self._heap[0][2:]) != self._heap[0][1]:
+                heapq.heappop(self._heap)
+
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            if timeout is None or timeout > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, seq, key, reason = heapq.heappop(self._heap)
+            del self._active[(key, reason)]
+
+            try:
+                await self.callback(key, reason)
+            except Exception as exc:
+                log.exception("Idle reaper failed to reclaim %s (%s): %r", key, reason, exc,
+                              extra={"guild": key, "reason": reason})
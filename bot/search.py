@@ -0,0 +1,98 @@
+import heapq
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+TOKEN_REGEX = re.compile(r"\w+")
+MIN_SCORE = 0.5
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def tokens(text):
+    return TOKEN_REGEX.findall(normalize(text))
+
+
+def ngrams(text, n=3):
+    grams = set()
+    for token in tokens(text):
+        padded = f" {token} "
+        grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+class TrackIndex:
+    # Trigram postings over each upcoming track's title and author. Entries are the queue's own stub objects,
+    # so a lookup returns tracks directly and the queue can find their current positions.
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._grams = {}
+
+    def __len__(self):
+        return len(self._grams)
+
+    @staticmethod
+    def text(track):
+        return f"{track.title or ''} {track.author or ''}"
+
+    def add(self, tracks):
+        for track in tracks:
+            if track is None or track in self._grams:
+                continue
+            grams = self._grams[track] = ngrams(self.text(track))
+            for gram in grams:
+                self._postings[gram].add(track)
+
+    def remove(self, tracks):
+        for track in tracks:
+            if (grams := self._grams.pop(track, None)) is None:
+                continue
+            for gram in grams:
+                if (posting := self._postings.get(gram)) is not None:
+                    posting.discard(track)
+                    if not posting:
+                        del self._postings[gram]
+
+    def clear(self):
+        self._postings.clear()
+        self._grams.clear()
+
+    def listener(self, event, *args):
+        if event == "add":
+            self.add(args[0])
+        elif event == "insert":
+            self.add(args[1])
+        elif event in ("remove", "trim", "advance"):
+            self.remove(args[-1])
+        elif event == "rewind":
+            self.add(args[0])
+        elif event == "reorder" and args:
+            self.remove(args[0])
+            self.add(args[1])
+        elif event == "clear":
+            self.clear()
+
+    def search(self, query, limit=10):
+        if not (grams := ngrams(query)):
+            return []
+
+        scores = Counter()
+        for gram in grams:
+            if (posting := self._postings.get(gram)) is not None:
+                scores.update(posting)
+
+        needle = " ".join(tokens(query))
+        threshold = len(grams) * MIN_SCORE
+        # Only the best-scoring candidates pay for the whole-phrase check, which outranks tracks
+        # that merely share scattered trigrams with the query.
+        candidates = heapq.nlargest(limit * 4, ((hits, track) for track, hits in scores.items() if hits >= threshold),
+                                    key=lambda c: c[0])
+        ranked = sorted(
+            candidates,
+            key=lambda c: (needle in " ".join(tokens(self.text(c[1]))), c[0], -len(self._grams[c[1]])),
+            reverse=True
+        )
+        return [track for _, track in ranked[:limit]]
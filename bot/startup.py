@@ -0,0 +1,37 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.marks = {}
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.gauge("startup_phase_seconds", self.phases[name], phase=name)
+
+    def mark(self, name):
+        if name in self.marks:
+            return self.marks[name]
+
+        self.marks[name] = self.elapsed()
+        if self.metrics is not None:
+            self.metrics.gauge("startup_mark_seconds", self.marks[name], mark=name)
+        return self.marks[name]
+
+    def report(self):
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        marks = ", ".join(f"{name} at {seconds * 1000:.0f}ms" for name, seconds in self.marks.items())
+        return f"Startup phases: {phases}; {marks}"
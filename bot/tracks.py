@@ -0,0 +1,99 @@
+import time
+
+import wavelink
+
+
+class TrackStub:
+    __slots__ = ("id", "title", "author", "length", "identifier", "uri", "is_stream", "requester", "loaded_at",
+                 "_track")
+
+    def __init__(self, id_, title, author, length, identifier, uri, is_stream=False, requester=None, loaded_at=None):
+        self.id = id_
+        self.title = title
+        self.author = author
+        self.length = length
+        self.identifier = identifier
+        self.uri = uri
+        self.is_stream = is_stream
+        self.requester = requester
+        self.loaded_at = loaded_at
+        self._track = None
+
+    def __str__(self):
+        return self.title
+
+    def __repr__(self):
+        return f"<TrackStub identifier={self.identifier!r} title={self.title!r}>"
+
+    @staticmethod
+    def row_from_data(data):
+        info = data["info"]
+        return (
+            data["track"],
+            info.get("title"),
+            info.get("author"),
+            info.get("length", 0),
+            info.get("identifier", ""),
+            info.get("uri"),
+            info.get("isStream", False),
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def as_row(self):
+        return (self.id, self.title, self.author, self.length, self.identifier, self.uri, self.is_stream,
+                self.requester, self.loaded_at)
+
+    def is_stale(self, max_age):
+        return time.time() - self.loaded_at > max_age
+
+    @property
+    def info(self):
+        return {
+            "identifier": self.identifier,
+            "title": self.title,
+            "author": self.author,
+            "length": self.length,
+            "uri": self.uri,
+            "isStream": self.is_stream,
+            "isSeekable": not self.is_stream,
+            "position": 0,
+        }
+
+    @property
+    def is_resolved(self):
+        return self._track is not None
+
+    def resolve(self):
+        if self._track is None:
+            self._track = wavelink.Track(self.id, self.info)
+        return self._track
+
+    def release(self):
+        self._track = None
+
+
+class TrackResults:
+    # What a query resolved to, kept as plain row tuples: a cached result holds no wavelink objects, is safe to
+    # share between guilds, and every caller gets its own stubs.
+    __slots__ = ("rows", "playlist", "loaded_at")
+
+    def __init__(self, rows, playlist=False, loaded_at=None):
+        self.rows = rows
+        self.playlist = playlist
+        self.loaded_at = time.time() if loaded_at is None else loaded_at
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(tuple(TrackStub.row_from_data(d) for d in data["tracks"]), bool(data.get("playlistInfo")))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def stub(self, index, requester=None):
+        return TrackStub(*self.rows[index], requester, self.loaded_at)
+
+    def stubs(self, start=0, stop=None, requester=None):
+        return (TrackStub(*row, requester, self.loaded_at) for row in self.rows[start:stop])
@@ -0,0 +1,40 @@
+def format_duration(ms):
+    minutes, rest = divmod(ms, 60000)
+    return f"{int(minutes)}:{round(rest / 1000):02}"
+
+
+def format_total(ms):
+    hours, rest = divmod(int(ms) // 1000, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+class QueueRenderer:
+    def __init__(self, queue):
+        self.queue = queue
+        self.renders = 0
+        self._pages = {}
+        self._track = None
+        self._track_fields = None
+        queue.listeners.append(self.invalidate)
+
+    def invalidate(self, *args):
+        self._pages.clear()
+
+    def upcoming(self, start, count):
+        key = (start, count)
+        position = self.queue.position
+
+        if (cached := self._pages.get(key)) is not None and cached[0] == position:
+            return cached[1]
+
+        text = "\n".join(f"**{i}.** {t.title}" for i, t in enumerate(self.queue.window(start, count), start + 1))
+        self._pages[key] = (position, text)
+        self.renders += 1
+        return text
+
+    def track_fields(self, track):
+        if self._track is not track:
+            self._track = track
+            self._track_fields = (track.title, track.author, format_duration(track.length))
+        return self._track_fields
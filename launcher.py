@@ -1,8 +1,63 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+
 from bot import MusicBot
+from bot.config import load_config
+from bot.ipc import IPCServer
+from bot.logs import setup_logging
 
-def main():
-    bot = MusicBot()
+log = logging.getLogger("launcher")
+
+
+def run_worker(worker_id, shard_ids, shard_count, ipc_port):
+    bot = MusicBot(shard_ids=shard_ids, shard_count=shard_count, worker_id=worker_id, ipc_port=ipc_port)
     bot.run()
 
+
+async def supervise(args):
+    log_handler = setup_logging(load_config()["logging"], ".supervisor")
+    server = IPCServer(port=args.ipc_port)
+    await server.start()
+
+    ctx = multiprocessing.get_context("spawn")
+    shards = list(range(args.shards))
+    processes = []
+
+    for worker_id in range(args.workers):
+        shard_ids = shards[worker_id::args.workers]
+        process = ctx.Process(target=run_worker, args=(worker_id, shard_ids, args.shards, args.ipc_port),
+                              name=f"musicbot-worker-{worker_id}")
+        process.start()
+        processes.append(process)
+        log.info("Started worker %d with shards %s", worker_id, shard_ids,
+                 extra={"worker": worker_id, "shards": shard_ids})
+
+    try:
+        while any(p.is_alive() for p in processes):
+            await asyncio.sleep(1.0)
+    finally:
+        for process in processes:
+            process.terminate()
+        await server.stop()
+        log_handler.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the music bot.")
+    parser.add_argument("--shards", type=int, default=None, help="total shard count")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--ipc-port", type=int, default=8765, help="local port used by the worker IPC")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        bot = MusicBot(shard_count=args.shards)
+        bot.run()
+    else:
+        if args.shards is None or args.shards < args.workers:
+            parser.error("--shards must be given and be at least --workers when running several workers")
+        asyncio.run(supervise(args))
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
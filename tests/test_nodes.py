@@ -0,0 +1,195 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+
+from bot.loadtest import FakeLavalink
+from bot.nodes import CircuitBreaker, NodePool, NodeUnavailable
+
+
+def node(identifier, playing=0, load=0.0, available=True):
+    players = {n: SimpleNamespace(is_playing=True) for n in range(playing)}
+    stats = SimpleNamespace(playing_players=playing, system_load=load, frames_deficit=-1, frames_nulled=-1)
+    return SimpleNamespace(identifier=identifier, is_available=available, players=players, stats=stats)
+
+
+def pool(*nodes, **options):
+    pool = NodePool(SimpleNamespace(nodes={n.identifier: n for n in nodes}), [], **options)
+    pool.refresh()
+    return pool
+
+
+def test_best_node_prefers_lowest_penalty():
+    busy, idle, loaded = node("busy", playing=20), node("idle"), node("loaded", load=0.5)
+    assert pool(busy, idle, loaded).best_node() is idle
+
+
+def test_best_node_skips_unavailable_open_and_overloaded_nodes():
+    down, tripped = node("down", available=False), node("tripped")
+    overloaded, fallback = node("overloaded", playing=50), node("fallback", playing=10)
+    nodes = pool(down, tripped, overloaded, fallback, max_penalty=40)
+    for _ in range(nodes.breaker_threshold):
+        nodes.health_of(tripped).breaker.failure()
+
+    assert nodes.best_node() is fallback
+    assert nodes.best_node(exclude=fallback) is None
+
+
+def test_assigned_players_spread_until_the_next_refresh():
+    a, b = node("a"), node("b", playing=2)
+    nodes = pool(a, b)
+
+    picks = []
+    for _ in range(6):
+        picks.append((best := nodes.best_node()).identifier)
+        nodes.assigned(best)
+
+    assert picks == ["a", "a", "a", "b", "a", "b"]
+    nodes.refresh()
+    assert nodes.penalty(a) == 0 and nodes.penalty(b) == 2
+
+
+def test_penalty_is_cached_between_refreshes():
+    a = node("a")
+    nodes = pool(a)
+    a.players.update({n: SimpleNamespace(is_playing=True) for n in range(5)})
+    a.stats.playing_players = 5
+
+    assert nodes.penalty(a) == 0
+    nodes.refresh()
+    assert nodes.penalty(a) == 5
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    monkeypatch.setattr(time, "monotonic", clock := Clock())
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30.0)
+
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock.now += 30.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_failed_trial_reopens_the_breaker(monkeypatch):
+    monkeypatch.setattr(time, "monotonic", clock := Clock())
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30.0)
+    breaker.failure()
+
+    clock.now += 30.0
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 29.0
+    assert not breaker.allow()
+    clock.now += 1.0
+    assert breaker.allow()
+
+
+def test_healthy_clears_only_a_closed_breaker(monkeypatch):
+    monkeypatch.setattr(time, "monotonic", clock := Clock())
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30.0)
+
+    breaker.failure()
+    breaker.healthy()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.failure()
+    breaker.healthy()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 30.0
+    breaker.healthy()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def with_lavalink(test, **faults):
+    # Runs test(pool, lavalink) against a FakeLavalink serving HTTP on localhost.
+    async def run():
+        lavalink = FakeLavalink(**faults)
+        await lavalink.start()
+        config = lavalink.config
+        fake = SimpleNamespace(identifier=config["identifier"], rest_uri=config["rest_uri"], password=lavalink.password,
+                               is_available=True, players={}, stats=None)
+        try:
+            async with aiohttp.ClientSession() as session:
+                client = SimpleNamespace(nodes={fake.identifier: fake}, session=session)
+                return await test(NodePool(client, [], load_timeout=0.5, load_retries=2, retry_backoff=0.0,
+                                           breaker_threshold=3), lavalink)
+        finally:
+            await lavalink.stop()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def test_load_tracks_returns_results():
+    async def test(pool, lavalink):
+        tracks = await pool.load_tracks("ytsearch:never gonna give you up")
+        assert tracks is not None and len(tracks)
+        assert lavalink.requests["loadtracks"] == 1
+
+    with_lavalink(test)
+
+
+def test_load_tracks_retries_then_raises_node_unavailable():
+    async def test(pool, lavalink):
+        with pytest.raises(NodeUnavailable):
+            await pool.load_tracks("ytsearch:anything")
+        assert lavalink.requests["loadtracks"] == pool.load_retries + 1
+        assert pool.health["LOADTEST"].breaker.state == CircuitBreaker.OPEN
+
+        # The open breaker turns requests away without reaching the node.
+        with pytest.raises(NodeUnavailable):
+            await pool.load_tracks("ytsearch:anything")
+        assert lavalink.requests["loadtracks"] == pool.load_retries + 1
+
+    with_lavalink(test, error_rate=1.0)
+
+
+def test_load_tracks_times_out_hanging_requests():
+    async def test(pool, lavalink):
+        with pytest.raises(NodeUnavailable):
+            await pool.load_tracks("ytsearch:anything")
+        assert lavalink.faults["hang"] == pool.load_retries + 1
+
+    with_lavalink(test, hang_rate=1.0, hang_time=5.0)
+
+
+def test_cancelled_trial_lets_the_next_request_try():
+    async def test(pool, lavalink):
+        breaker = pool.health_of(pool.client.nodes["LOADTEST"]).breaker
+        breaker.opened_at = time.monotonic() - breaker.reset_timeout
+
+        lavalink.hang_rate = 1.0
+        task = asyncio.ensure_future(pool.load_tracks("ytsearch:anything"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        lavalink.hang_rate = 0.0
+        assert await pool.load_tracks("ytsearch:anything") is not None
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    with_lavalink(test)